@@ -3,6 +3,7 @@ from django.shortcuts import render, redirect
 from django.views import View
 
 from accounts.forms import LoginForm, RegisterForm
+from work_and_travel_app.ratelimit import RateLimitMixin
 
 # Create your views here.
 from django.contrib.auth import authenticate, login
@@ -37,7 +38,8 @@ class LogoutView(View):
         return redirect('login_view')
 
 
-class RegistrationView(View):
+class RegistrationView(RateLimitMixin, View):
+    rate_limit_scope = 'register'
 
     def get(self, request):
         form = RegisterForm()
@@ -2,6 +2,7 @@
 ASGI config for work_and_travel project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP is served by Django, WebSocket connections by the conversation socket.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +14,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'work_and_travel.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from work_and_travel_app.websocket import conversation_socket  # noqa: E402  (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await conversation_socket(scope, receive, send)
+    return await django_application(scope, receive, send)
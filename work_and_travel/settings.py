@@ -37,7 +37,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'work_and_travel_app',
+    'django.contrib.postgres',
+    'work_and_travel_app.apps.WorkAndTravelAppConfig',
     'accounts.apps.AccountsConfig',
 ]
 
@@ -46,6 +47,50 @@ LOGIN_URL = 'login_view'
 LOGOUT_URL = 'logout_view'
 LOGIN_REDIRECT_URL = 'start'
 
+OFFERS_LIST_PAGE_SIZE = 2
+OFFERS_LIST_MAX_PAGE_SIZE = 50
+# ?page= links are served with OFFSET pagination up to this page, deeper pages switch to ?after= cursors
+OFFERS_LIST_MAX_OFFSET_PAGE = 10
+
+# Messages per page of a topic's history; older pages are fetched with a (time, id) cursor
+TOPIC_PAGE_SIZE = 20
+TOPIC_MAX_PAGE_SIZE = 100
+# archive_messages moves conversations on inactive offers idle for this many days into compressed storage
+MESSAGE_ARCHIVE_AFTER_DAYS = 180
+MESSAGE_ARCHIVE_CHUNK_SIZE = 100
+
+# Inbox search results per page, paged with a (rank, id) cursor
+MESSAGE_SEARCH_PAGE_SIZE = 20
+MESSAGE_SEARCH_MAX_PAGE_SIZE = 100
+# Seconds a long-poll request for new topic messages is held open before it returns empty
+LONG_POLL_TIMEOUT = 25
+
+# Ratings per page of YourGradesView and its JSON variant, paged with an id cursor
+RATING_HISTORY_PAGE_SIZE = 20
+RATING_HISTORY_MAX_PAGE_SIZE = 100
+
+# Owners ranked by Bayesian average grade: LEADERBOARD_PRIOR_WEIGHT virtual grades at the scope's mean are
+# added to every owner's own. The in-memory rankings are rebuilt after LEADERBOARD_MAX_AGE seconds, or
+# when more than LEADERBOARD_MAX_CHANGES grade changes of other processes would have to be applied.
+LEADERBOARD_PRIOR_WEIGHT = 5
+LEADERBOARD_SIZE = 20
+LEADERBOARD_MAX_AGE = 60 * 60
+LEADERBOARD_MAX_CHANGES = 1000
+
+NEARBY_OFFERS_DEFAULT_RADIUS = 25
+NEARBY_OFFERS_MAX_RADIUS = 500
+
+GAZETTEER_PATH = BASE_DIR / 'work_and_travel_app' / 'data' / 'gazetteer.csv'
+GEOCODING_CHUNK_SIZE = 1000
+
+# Background tasks run in a thread pool after the transaction commits; eager mode runs them inline.
+TASKS_WORKERS = 2
+TASKS_ALWAYS_EAGER = False
+
+# Pub/sub used to push new messages and unread counters to open WebSockets. The in-memory broker only
+# reaches clients connected to the same process.
+PUBSUB_BACKEND = 'work_and_travel_app.pubsub.InMemoryBroker'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,12 +115,14 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'work_and_travel_app.context_processors.unread_messages',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'work_and_travel.wsgi.application'
+ASGI_APPLICATION = 'work_and_travel.asgi.application'
 
 
 # Database
@@ -93,6 +140,32 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Token buckets per client (user, or IP address when anonymous) for write endpoints: 'N/period' allows
+# bursts of N requests, refilled at N per period (s, m, h, d; e.g. '5/10m'). Missing scopes are unlimited.
+RATE_LIMITS = {
+    'message': '30/m',
+    'offer': '10/h',
+    'register': '5/h',
+}
+
+FACETS_CACHE_TIMEOUT = 300
+UNREAD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Seconds between in-process runs of the offer expiry job, None disables it (use the
+# deactivate_expired_offers management command from cron instead).
+OFFER_EXPIRY_INTERVAL = None
+OFFER_EXPIRY_BATCH_SIZE = 500
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -20,7 +20,10 @@ from django.urls import path
 
 from work_and_travel_app.views import AddOfferView, YourProfile, AddBaseInfoView, EditBaseInfoView, StartView, \
     OfferDetailsView, EditOfferView, MessagesView, OffersListView, GradeView, MessageBoxView, YourOffers, TopicView, \
-    DeleteOfferView, YourGradesView, AnswerToRatingView
+    DeleteOfferView, YourGradesView, AnswerToRatingView, LocationLookupView, \
+    NearbyOffersView, LocationAutocompleteView, AvailabilityCalendarView, TopicHistoryView, \
+    TopicUpdatesView, MessageSearchView, BroadcastView, LeaderboardView, YourGradesHistoryView, \
+    RatingAnalyticsView
 from accounts import views as account_view
 
 urlpatterns = [
@@ -33,16 +36,27 @@ urlpatterns = [
     path('add_base_info/', AddBaseInfoView.as_view(), name='add_base_info'),
     path('edit_base_info/', EditBaseInfoView.as_view(), name='edit_base_info'),
     path('profile/', YourProfile.as_view(), name='your_profile'),
+    path('profile/ratings/', RatingAnalyticsView.as_view(), name='rating_analytics'),
     path('offers_list/', OffersListView.as_view(), name='offers_list'),
+    path('locations/lookup/', LocationLookupView.as_view(), name='location_lookup'),
+    path('locations/autocomplete/', LocationAutocompleteView.as_view(), name='location_autocomplete'),
+    path('offers/calendar/', AvailabilityCalendarView.as_view(), name='availability_calendar'),
+    path('offers/nearby/', NearbyOffersView.as_view(), name='nearby_offers'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('offer_details/<int:offer_id>/', OfferDetailsView.as_view(), name='offer_details'),
     path('edit_offer/<int:offer_id>/', EditOfferView.as_view(), name='edit_offer'),
     path('delete_offer_ays/<int:offer_id>', DeleteOfferView.as_view(), name='delete_offer_ays'),
     path('delete_offer/<int:offer_id>/', DeleteOfferView.as_view(), name='delete_offer'),
     path('message_box/', MessageBoxView.as_view(), name='message_box'),
+    path('message_box/search/', MessageSearchView.as_view(), name='message_search'),
     path('messages/<int:offer_id>/', MessagesView.as_view(), name='messages_view'),
+    path('messages/<int:offer_id>/broadcast/', BroadcastView.as_view(), name='broadcast'),
     path('messages/<int:offer_id>/<int:sender_id>/', TopicView.as_view(), name='topic_view'),
+    path('messages/<int:offer_id>/<int:sender_id>/history/', TopicHistoryView.as_view(), name='topic_history'),
+    path('messages/<int:offer_id>/<int:sender_id>/updates/', TopicUpdatesView.as_view(), name='topic_updates'),
     path('rating/<int:offer_id>/<int:sender_id>', GradeView.as_view(), name='grade_view'),
     path('your_offers/', YourOffers.as_view(), name='your_offers'),
     path('your_grades/', YourGradesView.as_view(), name='your_grades'),
+    path('your_grades/history/', YourGradesHistoryView.as_view(), name='your_grades_history'),
     path('rating_answer/<int:grade_id>/', AnswerToRatingView.as_view(), name='answer_view'),
 ]
@@ -0,0 +1,128 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from work_and_travel_app.models import RatingRollup
+from work_and_travel_app.reputation import RATING_KINDS, RATING_VALUES
+
+
+def record_rollup(kind, owner_id, offer_id, created, value, sign=1):
+    """Adds (sign=1) or removes (sign=-1) one rating of the given value to its day's rollup row in SQL."""
+    if owner_id is None or offer_id is None or value not in RATING_VALUES:
+        return
+    key = {'owner_id': owner_id, 'offer_id': offer_id, 'day': timezone.localdate(created), 'kind': kind, 'value': value}
+    with transaction.atomic():
+        rollups = RatingRollup.objects.filter(**key)
+        if sign < 0:
+            rollups.filter(count__gt=0).update(count=F('count') - 1)
+            return
+        if rollups.update(count=F('count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                RatingRollup.objects.create(count=1, **key)
+        except IntegrityError:
+            # Created concurrently by another rating.
+            rollups.update(count=F('count') + 1)
+
+
+def rebuild_rollups(owner_ids):
+    """Recounts the rollups of the owners from their Grade and Answer rows."""
+    rollups = []
+    for kind, (model, field, owner, offer) in RATING_KINDS.items():
+        rows = model.objects.filter(**{f'{owner}__in': owner_ids}).values(
+            owner_id=F(owner), offer_id=F(offer), day=TruncDate('created'), value=F(field),
+        ).annotate(count=Count('id')).order_by()
+        rollups.extend(RatingRollup(kind=kind, **row) for row in rows)
+    with transaction.atomic():
+        RatingRollup.objects.filter(owner_id__in=owner_ids).delete()
+        RatingRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+def _summary(counts):
+    count = sum(counts)
+    return {
+        'histogram': counts,
+        'count': count,
+        'average': sum(value * n for value, n in zip(RATING_VALUES, counts)) / count if count else None,
+    }
+
+
+def _comparison(summaries):
+    grade, answer = summaries['grade']['average'], summaries['answer']['average']
+    return answer - grade if grade is not None and answer is not None else None
+
+
+def rating_rollups(owner_id=None, offer_id=None, since=None, until=None):
+    rollups = RatingRollup.objects.all()
+    if owner_id is not None:
+        rollups = rollups.filter(owner_id=owner_id)
+    if offer_id is not None:
+        rollups = rollups.filter(offer_id=offer_id)
+    if since:
+        rollups = rollups.filter(day__gte=since)
+    if until:
+        rollups = rollups.filter(day__lte=until)
+    return rollups
+
+
+def rating_analytics(owner_id=None, offer_id=None, since=None, until=None):
+    """
+    Distribution of values, monthly trend and answer-vs-grade comparison of the ratings given on an
+    owner's offers or on one offer, between the since and until days (both inclusive, either may be
+    None). Read from the daily rollups in one query grouped by month, kind and value, so the number of
+    rows read depends on the months in range rather than on the number of ratings.
+    """
+    rows = rating_rollups(owner_id, offer_id, since, until).values(
+        'kind', 'value', month=TruncMonth('day'),
+    ).annotate(total=Sum('count')).order_by('month')
+
+    totals = {kind: [0 for _ in RATING_VALUES] for kind in RATING_KINDS}
+    months = {}
+    for row in rows:
+        if not row['total']:
+            continue
+        index = row['value'] - RATING_VALUES.start
+        totals[row['kind']][index] += row['total']
+        counts = months.setdefault(row['month'], {kind: [0 for _ in RATING_VALUES] for kind in RATING_KINDS})
+        counts[row['kind']][index] += row['total']
+
+    summaries = {kind: _summary(counts) for kind, counts in totals.items()}
+    trend = []
+    for month, counts in months.items():
+        entry = {kind: _summary(kind_counts) for kind, kind_counts in counts.items()}
+        entry.update(month=month, difference=_comparison(entry))
+        trend.append(entry)
+    distribution = [
+        {'value': value, **{kind: counts[index] for kind, counts in totals.items()}}
+        for index, value in enumerate(RATING_VALUES)
+    ]
+    return dict(summaries, distribution=distribution, trend=trend, difference=_comparison(summaries))
+
+
+def offer_rating_summaries(owner_id, since=None, until=None):
+    """Count and average of grades and answers for each of the owner's rated offers, from the rollups."""
+    rows = rating_rollups(owner_id, since=since, until=until).values('offer_id', 'offer__name', 'kind').annotate(
+        ratings=Sum('count'), total=Sum(F('count') * F('value')),
+    ).order_by('offer__name', 'offer_id')
+
+    offers = {}
+    for row in rows:
+        if not row['ratings']:
+            continue
+        offer = offers.setdefault(row['offer_id'], {
+            'offer_id': row['offer_id'], 'name': row['offer__name'],
+            **{kind: {'count': 0, 'average': None} for kind in RATING_KINDS},
+        })
+        offer[row['kind']] = {'count': row['ratings'], 'average': row['total'] / row['ratings']}
+    return list(offers.values())
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class WorkAndTravelAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'work_and_travel_app'
+
+    def ready(self):
+        from django.conf import settings
+
+        from work_and_travel_app import receivers  # noqa: F401
+        from work_and_travel_app.scheduler import start_scheduler
+
+        start_scheduler(settings)
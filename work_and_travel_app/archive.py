@@ -0,0 +1,157 @@
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from work_and_travel_app.models import ArchivedConversation, Conversation, Grade, Message
+from work_and_travel_app.pagination import InvalidCursor, KeysetPage, decode_cursor
+
+
+def encode_messages(messages):
+    rows = [[message.id, message.sender_id, message.receiver_id, message.time.isoformat(), message.message]
+            for message in messages]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode())
+
+
+def decode_messages(archive):
+    """The archived messages as unsaved Message instances, oldest first."""
+    rows = json.loads(zlib.decompress(bytes(archive.payload)))
+    return [
+        Message(id=message_id, sender_id=sender_id, receiver_id=receiver_id, time=parse_datetime(time),
+                message=text, offer_id=archive.offer_id, conversation_id=archive.conversation_id)
+        for message_id, sender_id, receiver_id, time, text in rows
+    ]
+
+
+def archivable_conversations(cutoff):
+    # Graded messages stay live: grades and their answers point at them.
+    graded = Grade.objects.filter(message__conversation=OuterRef('pk'))
+    live = Message.objects.filter(conversation=OuterRef('pk'))
+    return Conversation.objects.filter(
+        offer__is_active=False, last_activity__lt=cutoff
+    ).filter(Exists(live)).exclude(Exists(graded))
+
+
+def ensure_archive_partitions(years):
+    if connection.vendor != 'postgresql':
+        return
+    table = ArchivedConversation._meta.db_table
+    with connection.cursor() as cursor:
+        for year in sorted(years):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table}_y{year} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+
+
+def archive_conversations(older_than_days=None, chunk_size=None):
+    """
+    Moves the messages of conversations on inactive offers, idle for longer than older_than_days, into
+    ArchivedConversation rows holding one compressed payload per conversation. Works in chunks of
+    conversations, each in its own transaction. Returns (conversations, messages) archived.
+    """
+    older_than_days = settings.MESSAGE_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    chunk_size = chunk_size or settings.MESSAGE_ARCHIVE_CHUNK_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+
+    archived_conversations = archived_messages = 0
+    while True:
+        with transaction.atomic():
+            conversations = list(archivable_conversations(cutoff).order_by('id')[:chunk_size])
+            if not conversations:
+                break
+            messages = {conversation.id: [] for conversation in conversations}
+            for message in Message.objects.filter(conversation__in=conversations).order_by('time', 'id'):
+                messages[message.conversation_id].append(message)
+
+            archives = [
+                ArchivedConversation(
+                    conversation_id=conversation.id, offer_id=conversation.offer_id, owner_id=conversation.owner_id,
+                    applicant_id=conversation.applicant_id, first_message_time=messages[conversation.id][0].time,
+                    last_message_time=messages[conversation.id][-1].time,
+                    message_count=len(messages[conversation.id]), payload=encode_messages(messages[conversation.id]),
+                )
+                for conversation in conversations
+            ]
+            ensure_archive_partitions({archive.last_message_time.year for archive in archives})
+            ArchivedConversation.objects.bulk_create(archives)
+            # Only the messages that were read above: one sent in the meantime stays live.
+            Message.objects.filter(pk__in=[message.id for chunk in messages.values() for message in chunk]).delete()
+
+        archived_conversations += len(archives)
+        archived_messages += sum(archive.message_count for archive in archives)
+    return archived_conversations, archived_messages
+
+
+def archived_messages(conversation_ids, before=None, limit=None):
+    """
+    Archived messages of the conversations older than the (time, id) position before, newest first.
+    Payloads are decompressed one archive row at a time until limit messages are found.
+    """
+    archives = ArchivedConversation.objects.filter(conversation_id__in=conversation_ids).order_by('-last_message_time')
+    if before:
+        archives = archives.filter(first_message_time__lte=before[0])
+
+    found = []
+    for archive in archives.iterator(chunk_size=10):
+        found.extend(message for message in reversed(decode_messages(archive))
+                     if before is None or (message.time, message.id) < before)
+        if limit is not None and len(found) >= limit:
+            found = found[:limit]
+            break
+
+    users = User.objects.in_bulk({message.sender_id for message in found} | {message.receiver_id for message in found})
+    for message in found:
+        message.sender, message.receiver = users.get(message.sender_id), users.get(message.receiver_id)
+    # Deleting a user removes their live messages, so their archived ones are hidden as well.
+    return [message for message in found if message.sender and message.receiver]
+
+
+def purge_archives(offer_id=None, applicant_id=None):
+    """Deletes the archived conversations of a deleted offer or applicant, message bodies included."""
+    if offer_id is not None:
+        ArchivedConversation.objects.filter(offer_id=offer_id).delete()
+    if applicant_id is not None:
+        ArchivedConversation.objects.filter(applicant_id=applicant_id).delete()
+
+
+def _cursor_position(cursor):
+    try:
+        values = decode_cursor(cursor)
+        time = parse_datetime(values[0]) if len(values) == 2 else None
+        position = (time, int(values[1])) if time else None
+    except (InvalidCursor, TypeError, ValueError):
+        return None
+    return position
+
+
+def continue_from_archive(page, conversation_ids, after=None):
+    """
+    Fills a ('-time', '-id') keyset page of live messages up from the archive once the live messages
+    run out, so a conversation's history reads the same before and after it was archived.
+    """
+    if page.has_next():
+        return page
+    paginator = page.paginator
+    missing = paginator.per_page - len(page)
+    if page:
+        before = (page[-1].time, page[-1].id)
+    else:
+        before = _cursor_position(after) if after else None
+
+    older = archived_messages(conversation_ids, before, missing + 1)
+    if not older:
+        return page
+    object_list = list(page) + older[:missing]
+    return KeysetPage(
+        object_list,
+        paginator,
+        next_cursor=paginator.cursor(object_list[-1]) if len(older) > missing else None,
+        previous_cursor=page.previous_cursor,
+    )
@@ -0,0 +1,143 @@
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+
+from work_and_travel_app.caching import bump_version, get_version
+from work_and_travel_app.geocoding import normalize
+from work_and_travel_app.models import Offer
+
+AUTOCOMPLETE_NAMESPACE = 'autocomplete'
+MAX_CACHED_SUGGESTIONS = 10000
+
+
+def _keys(label):
+    # Every word start is searchable, so "york" finds "New York".
+    words = normalize(label).split()
+    return {' '.join(words[position:]) for position in range(len(words))}
+
+
+class LocationIndex:
+    """
+    In-memory prefix index of the countries and cities of active offers. Entries are kept in a sorted
+    list of (key, country, city) tuples, so a prefix lookup is a bisect plus a short scan; `counts`
+    holds the number of active offers per (country, city), with city '' for the whole country.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.entries = []
+        self.counts = Counter()
+        self.offers = {}
+        self.suggestions = {}
+
+    @classmethod
+    def build(cls, version):
+        index = cls(version)
+        for offer_id, country, city in Offer.objects.filter(is_active=True).values_list('id', 'country', 'city'):
+            index.offers[offer_id] = (country, city)
+            index.counts[(country, '')] += 1
+            index.counts[(country, city)] += 1
+        index.entries = sorted(
+            (key, country, city) for country, city in index.counts for key in _keys(city or country)
+        )
+        return index
+
+    def add(self, offer_id, country, city):
+        self.suggestions.clear()
+        self.offers[offer_id] = (country, city)
+        for place in ((country, ''), (country, city)):
+            self.counts[place] += 1
+            if self.counts[place] == 1:
+                for key in _keys(place[1] or place[0]):
+                    insort(self.entries, (key, *place))
+
+    def remove(self, offer_id):
+        if offer_id not in self.offers:
+            return
+        self.suggestions.clear()
+        country, city = self.offers.pop(offer_id)
+        for place in ((country, ''), (country, city)):
+            self.counts[place] -= 1
+            if self.counts[place] == 0:
+                del self.counts[place]
+                for key in _keys(place[1] or place[0]):
+                    position = bisect_left(self.entries, (key, *place))
+                    if position < len(self.entries) and self.entries[position] == (key, *place):
+                        del self.entries[position]
+
+    def update(self, offer_id, country, city, is_active):
+        if self.offers.get(offer_id) == (country, city) and is_active:
+            return
+        self.remove(offer_id)
+        if is_active:
+            self.add(offer_id, country, city)
+
+    def suggest(self, text, limit=10):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        # Short prefixes match most of the index, so their results are kept until the next change.
+        if (prefix, limit) not in self.suggestions:
+            if len(self.suggestions) >= MAX_CACHED_SUGGESTIONS:
+                self.suggestions.clear()
+            self.suggestions[(prefix, limit)] = self._suggest(prefix, limit)
+        return self.suggestions[(prefix, limit)]
+
+    def _suggest(self, prefix, limit):
+        places = set()
+        position = bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+            places.add(self.entries[position][1:])
+            position += 1
+        places = sorted(places, key=lambda place: (-self.counts[place], place[1] != '', place))[:limit]
+        return [{
+            'type': 'city' if city else 'country',
+            'label': f'{city}, {country}' if city else country,
+            'country': country,
+            'city': city or None,
+            'offers': self.counts[(country, city)],
+        } for country, city in places]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def suggest_locations(text, limit=10):
+    global _index
+    version = get_version(AUTOCOMPLETE_NAMESPACE)
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = LocationIndex.build(version)
+        return _index.suggest(text, limit)
+
+
+def _apply(change):
+    with _lock:
+        if _index is not None:
+            change(_index)
+        version = bump_version(AUTOCOMPLETE_NAMESPACE)
+        # Other processes rebuild on the new version; this one is already up to date unless someone else
+        # bumped the version in the meantime.
+        if _index is not None and version == _index.version + 1:
+            _index.version = version
+
+
+def update_location_index(offer):
+    # Applied once the transaction commits: a rollback leaves the index alone, and other processes never
+    # rebuild from an uncommitted offer.
+    transaction.on_commit(partial(
+        _apply, partial(LocationIndex.update, offer_id=offer.id, country=offer.country, city=offer.city,
+                        is_active=offer.is_active)
+    ))
+
+
+def remove_from_location_index(offer_id):
+    transaction.on_commit(partial(_apply, partial(LocationIndex.remove, offer_id=offer_id)))
+
+
+def invalidate_location_index():
+    transaction.on_commit(partial(bump_version, AUTOCOMPLETE_NAMESPACE))
@@ -0,0 +1,93 @@
+import calendar
+from datetime import date, timedelta
+
+from django.contrib.postgres.fields import DateRangeField
+from django.db import connections
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import F, Func, Value
+from django.db.models.functions import Greatest
+
+from work_and_travel_app.models import Offer
+from work_and_travel_app.search import is_postgres
+
+MAX_FLEX_DAYS = 30
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_availability(params):
+    start = _parse_date(params.get('available_from'))
+    end = _parse_date(params.get('available_until'))
+    if start is None and end is None:
+        return None
+    start, end = start or end, end or start
+    if start > end:
+        start, end = end, start
+    try:
+        flex = min(max(int(params.get('flex', 0)), 0), MAX_FLEX_DAYS)
+    except ValueError:
+        flex = 0
+    return start, end, flex
+
+
+def offer_date_range():
+    # Must stay in sync with the offer_active_availability_gist index expression (migration 0022).
+    return Func(
+        F('since_when'), Greatest('since_when', 'until_when'), Value('[]'),
+        function='daterange', output_field=DateRangeField(),
+    )
+
+
+def filter_available(offers, start, end, flex=0):
+    start, end = start - timedelta(days=flex), end + timedelta(days=flex)
+    if is_postgres(offers):
+        return offers.alias(availability=offer_date_range()).filter(
+            availability__overlap=DateRange(start, end, '[]')
+        )
+    return offers.filter(since_when__lte=end, until_when__gte=start)
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def availability_calendar(year, month, using='default'):
+    """
+    Number of active offers available on every day of the month, as a list of (day, count) pairs.
+    The days are generated in SQL and joined to the offers, so the whole month is a single query.
+    """
+    first, last = month_bounds(year, month)
+    table = Offer._meta.db_table
+    if connections[using].vendor == 'postgresql':
+        sql = f'''
+            SELECT days.day::date, COUNT(offer.id)
+            FROM generate_series(%s::date, %s::date, interval '1 day') AS days(day)
+            LEFT JOIN {table} AS offer
+                ON offer.is_active
+                AND daterange(offer.since_when, GREATEST(offer.since_when, offer.until_when), '[]') @> days.day::date
+            GROUP BY days.day
+            ORDER BY days.day
+        '''
+    else:
+        sql = f'''
+            WITH RECURSIVE days(day) AS (
+                SELECT date(%s)
+                UNION ALL
+                SELECT date(day, '+1 day') FROM days WHERE day < date(%s)
+            )
+            SELECT days.day, COUNT(offer.id)
+            FROM days
+            LEFT JOIN {table} AS offer
+                ON offer.is_active AND offer.since_when <= days.day AND offer.until_when >= days.day
+            GROUP BY days.day
+            ORDER BY days.day
+        '''
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [first.isoformat(), last.isoformat()])
+        rows = cursor.fetchall()
+    return [(day if isinstance(day, date) else date.fromisoformat(day), count) for day, count in rows]
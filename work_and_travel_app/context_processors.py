@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from work_and_travel_app.conversations import get_unread_total
+
+
+def unread_messages(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_messages': 0}
+    return {'unread_messages': SimpleLazyObject(lambda: get_unread_total(user.id))}
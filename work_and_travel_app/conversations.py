@@ -0,0 +1,198 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from work_and_travel_app.models import Conversation, Message, Offer
+from work_and_travel_app.pagination import KeysetPaginator
+from work_and_travel_app.pubsub import conversation_channel, get_broker, user_channel
+from work_and_travel_app.tasks import run_async
+
+
+def conversation_applicant_id(owner_id, sender_id, receiver_id):
+    return receiver_id if sender_id == owner_id else sender_id
+
+
+def record_message(message):
+    """
+    Moves the message's conversation forward: last message, last activity and the unread count of
+    the receiving side, creating the conversation on its first message, and links the message to it.
+    Counters are incremented in SQL, so concurrent messages are not lost.
+    """
+    owner_id = Offer.objects.filter(pk=message.offer_id).values_list('owner_id', flat=True).get()
+    applicant_id = conversation_applicant_id(owner_id, message.sender_id, message.receiver_id)
+    unread = 'owner_unread' if message.receiver_id == owner_id else 'applicant_unread'
+    conversations = Conversation.objects.filter(offer_id=message.offer_id, applicant_id=applicant_id)
+
+    with transaction.atomic():
+        conversation_id = conversations.values_list('id', flat=True).first()
+        if conversation_id is None:
+            try:
+                with transaction.atomic():
+                    conversation_id = Conversation.objects.create(
+                        offer_id=message.offer_id, applicant_id=applicant_id, owner_id=owner_id,
+                        last_message=message, last_activity=message.time, **{unread: 1},
+                    ).id
+            except IntegrityError:
+                # Another message created the conversation first.
+                conversation_id = conversations.values_list('id', flat=True).get()
+                _advance(conversation_id, message, unread)
+        else:
+            _advance(conversation_id, message, unread)
+        Message.objects.filter(pk=message.pk).update(conversation_id=conversation_id)
+        unread_count = Conversation.objects.filter(pk=conversation_id).values_list(unread, flat=True).get()
+    message.conversation_id = conversation_id
+
+    def publish():
+        _adjust_unread_total(message.receiver_id, 1)
+        broker = get_broker()
+        broker.publish(conversation_channel(conversation_id), message_payload(message))
+        broker.publish(user_channel(message.receiver_id), unread_payload(conversation_id, unread_count))
+
+    transaction.on_commit(publish)
+
+
+def broadcast_conversations(offer):
+    # A conversation the owner started on their own offer has no applicant to send to.
+    return Conversation.objects.filter(offer=offer).exclude(applicant_id=offer.owner_id)
+
+
+def broadcast_message(offer, text):
+    """
+    Sends the text from the offer's owner to every applicant with a conversation on the offer: one
+    INSERT for all messages and one UPDATE for all conversations. Notifications are published by a
+    background task after commit. Returns the number of messages sent.
+    """
+    recipients = list(broadcast_conversations(offer).values_list('id', 'applicant_id'))
+    if not recipients:
+        return 0
+
+    with transaction.atomic():
+        messages = Message.objects.bulk_create([
+            Message(message=text, offer=offer, sender_id=offer.owner_id, receiver_id=applicant_id,
+                    conversation_id=conversation_id)
+            for conversation_id, applicant_id in recipients
+        ])
+        # The newest message rather than the one just inserted, in case a reply was saved meanwhile.
+        latest = Message.objects.filter(conversation_id=OuterRef('pk')).order_by('-time', '-id').values('id')[:1]
+        Conversation.objects.filter(pk__in=[conversation_id for conversation_id, _ in recipients]).update(
+            last_message=Subquery(latest), last_activity=messages[0].time, applicant_unread=F('applicant_unread') + 1,
+        )
+        run_async(publish_broadcast, [message.id for message in messages])
+    return len(messages)
+
+
+def publish_broadcast(message_ids):
+    broker = get_broker()
+    messages = Message.objects.filter(pk__in=message_ids).select_related('sender', 'conversation')
+    for message in messages:
+        _adjust_unread_total(message.receiver_id, 1)
+        broker.publish(conversation_channel(message.conversation_id), message_payload(message))
+        broker.publish(user_channel(message.receiver_id),
+                       unread_payload(message.conversation_id, message.conversation.applicant_unread))
+
+
+def message_payload(message):
+    return {
+        'type': 'message',
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.first_name,
+        'receiver_id': message.receiver_id,
+        'message': message.message,
+        'time': message.time.isoformat(),
+    }
+
+
+def unread_payload(conversation_id, unread_count):
+    return {'type': 'unread', 'conversation': conversation_id, 'unread': unread_count}
+
+
+def _advance(conversation_id, message, unread):
+    Conversation.objects.filter(pk=conversation_id).update(
+        last_message=message, last_activity=message.time, **{unread: F(unread) + 1},
+    )
+
+
+def topic_applicant_id(offer, sender_id, user):
+    # Topic URLs name the other participant: the applicant for the owner, the owner for an applicant.
+    return sender_id if user.id == offer.owner_id else user.id
+
+
+def find_conversation(offer, applicant_id):
+    return Conversation.objects.filter(offer=offer, applicant_id=applicant_id).first()
+
+
+def topic_conversation_ids(offer, applicant_id):
+    return Conversation.objects.filter(offer=offer, applicant_id=applicant_id).values('id')
+
+
+def topic_messages(offer, applicant_id):
+    return Message.objects.filter(conversation_id__in=topic_conversation_ids(offer, applicant_id))
+
+
+def messages_after(conversation_id, after, limit):
+    """Messages of the conversation newer than the (time, id) cursor, oldest first, and the cursor to poll from next."""
+    paginator = KeysetPaginator(
+        Message.objects.filter(conversation_id=conversation_id).select_related('sender'), ('time', 'id'), limit
+    )
+    page = paginator.page(after=after)
+    return [message_payload(message) for message in page], paginator.cursor(page[-1]) if page else after
+
+
+def mark_read(conversation, user):
+    side = 'owner' if user.id == conversation.owner_id else 'applicant'
+    unread = getattr(conversation, f'{side}_unread')
+    if not unread:
+        return
+    now = timezone.now()
+    conversations = Conversation.objects.filter(pk=conversation.pk)
+    # Only reset the count that was read, so the cached total can be decremented by exactly that much.
+    if conversations.filter(**{f'{side}_unread': unread}).update(**{f'{side}_unread': 0, f'{side}_read_at': now}):
+        on_commit = partial(_adjust_unread_total, user.id, -unread)
+    else:
+        conversations.update(**{f'{side}_unread': 0, f'{side}_read_at': now})
+        on_commit = partial(cache.delete, unread_total_key(user.id))
+    setattr(conversation, f'{side}_unread', 0)
+    setattr(conversation, f'{side}_read_at', now)
+
+    def publish():
+        on_commit()
+        get_broker().publish(user_channel(user.id), unread_payload(conversation.pk, 0))
+
+    transaction.on_commit(publish)
+
+
+def unread_total_key(user_id):
+    return f'unread:{user_id}'
+
+
+def get_unread_total(user_id):
+    total = cache.get(unread_total_key(user_id))
+    if total is None:
+        total = user_conversations_by_id(user_id).aggregate(total=Coalesce(
+            Sum('owner_unread', filter=Q(owner_id=user_id)), 0
+        ) + Coalesce(Sum('applicant_unread', filter=Q(applicant_id=user_id)), 0))['total']
+        cache.set(unread_total_key(user_id), total, settings.UNREAD_CACHE_TIMEOUT)
+    return total
+
+
+def _adjust_unread_total(user_id, delta):
+    try:
+        if cache.incr(unread_total_key(user_id), delta) < 0:
+            cache.delete(unread_total_key(user_id))
+    except ValueError:
+        # Not cached, the next get_unread_total() counts it from the conversations.
+        pass
+
+
+def user_conversations(user):
+    return user_conversations_by_id(user.id)
+
+
+def user_conversations_by_id(user_id):
+    return Conversation.objects.filter(Q(owner_id=user_id) | Q(applicant_id=user_id))
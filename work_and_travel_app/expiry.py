@@ -0,0 +1,24 @@
+from django.utils import timezone
+
+from work_and_travel_app.models import Offer
+from work_and_travel_app.signals import offers_changed
+
+
+def deactivate_expired_offers(today=None, batch_size=500):
+    today = today or timezone.now().date()
+    total = 0
+    while True:
+        offer_ids = list(
+            Offer.objects.filter(is_active=True, until_when__lt=today).order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not offer_ids:
+            break
+
+        # Every batch is its own short autocommitted UPDATE, so row locks are held only briefly.
+        total += Offer.objects.filter(id__in=offer_ids, is_active=True).update(is_active=False)
+        offers_changed.send(sender=Offer, offer_ids=offer_ids)
+
+        if len(offer_ids) < batch_size:
+            break
+    return total
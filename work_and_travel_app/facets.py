@@ -0,0 +1,148 @@
+import hashlib
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from work_and_travel_app.caching import bump_version, get_version
+from work_and_travel_app.models import Category, Offer
+
+FACETS_NAMESPACE = 'facets'
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def parse_facet_filters(params):
+    filters = {'category': None, 'country': None, 'offer_type': None, 'only_for_women': None}
+
+    category = params.get('category', '').strip()
+    if category.isdigit():
+        filters['category'] = int(category)
+
+    country = params.get('country', '').strip()
+    if country:
+        filters['country'] = country
+
+    offer_type = params.get('offer_type', '').strip()
+    if offer_type in dict(Offer.OFFER_CHOICES):
+        filters['offer_type'] = offer_type
+
+    only_for_women = params.get('only_for_women', '').strip().lower()
+    if only_for_women in TRUE_VALUES:
+        filters['only_for_women'] = True
+    elif only_for_women in FALSE_VALUES:
+        filters['only_for_women'] = False
+
+    return filters
+
+
+def apply_facet_filters(offers, filters):
+    if filters['category'] is not None:
+        offers = offers.filter(category=filters['category'])
+    if filters['country'] is not None:
+        offers = offers.filter(country=filters['country'])
+    if filters['offer_type'] is not None:
+        offers = offers.filter(offer_type=filters['offer_type'])
+    if filters['only_for_women'] is not None:
+        offers = offers.filter(only_for_women=filters['only_for_women'])
+    return offers
+
+
+def invalidate_facets():
+    # After commit, so a request running meanwhile cannot cache counts of the old rows under the new version.
+    transaction.on_commit(partial(bump_version, FACETS_NAMESPACE))
+
+
+def get_categories():
+    key = f'{FACETS_NAMESPACE}:{get_version(FACETS_NAMESPACE)}:categories'
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('name').values_list('id', 'name'))
+        cache.set(key, categories, settings.FACETS_CACHE_TIMEOUT)
+    return categories
+
+
+def build_facet_cube(offers, category_ids):
+    # One grouped query: a row per (country, offer_type, only_for_women) cell with its offer total and the
+    # number of its offers in every category. Every facet count can be folded from these cells in Python.
+    rows = offers.order_by().values('country', 'offer_type', 'only_for_women').annotate(
+        total=Count('id', distinct=True),
+        **{f'category_{category_id}': Count('id', filter=Q(category=category_id)) for category_id in category_ids}
+    )
+    return [
+        (
+            row['country'],
+            row['offer_type'],
+            row['only_for_women'],
+            row['total'],
+            {category_id: row[f'category_{category_id}'] for category_id in category_ids
+             if row[f'category_{category_id}']},
+        )
+        for row in rows
+    ]
+
+
+def get_facet_cube(offers, query_key, categories):
+    digest = hashlib.md5(query_key.encode()).hexdigest()
+    key = f'{FACETS_NAMESPACE}:{get_version(FACETS_NAMESPACE)}:cube:{digest}'
+    cube = cache.get(key)
+    if cube is None:
+        cube = build_facet_cube(offers, [category_id for category_id, name in categories])
+        cache.set(key, cube, settings.FACETS_CACHE_TIMEOUT)
+    return cube
+
+
+def count_facets(cube, filters):
+    def matches(cell, *facets):
+        country, offer_type, only_for_women = cell[:3]
+        values = {'country': country, 'offer_type': offer_type, 'only_for_women': only_for_women}
+        return all(filters[facet] is None or filters[facet] == values[facet] for facet in facets)
+
+    def size(cell):
+        return cell[3] if filters['category'] is None else cell[4].get(filters['category'], 0)
+
+    counts = {'category': Counter(), 'country': Counter(), 'offer_type': Counter(), 'only_for_women': Counter()}
+    total = 0
+    for cell in cube:
+        country, offer_type, only_for_women, cell_total, category_counts = cell
+        if matches(cell, 'country', 'offer_type', 'only_for_women'):
+            counts['category'].update(category_counts)
+            total += size(cell)
+        if matches(cell, 'offer_type', 'only_for_women'):
+            counts['country'][country] += size(cell)
+        if matches(cell, 'country', 'only_for_women'):
+            counts['offer_type'][offer_type] += size(cell)
+        if matches(cell, 'country', 'offer_type'):
+            counts['only_for_women'][only_for_women] += size(cell)
+    return counts, total
+
+
+def get_facets(offers, query_key, filters, params):
+    categories = get_categories()
+    counts, total = count_facets(get_facet_cube(offers, query_key, categories), filters)
+
+    def option(facet, value, label, param):
+        selected = filters[facet] == value
+        query = params.copy()
+        for key in ('page', 'after', 'before', facet):
+            query.pop(key, None)
+        if not selected:
+            query[facet] = param
+        return {'label': label, 'count': counts[facet][value], 'selected': selected, 'url': f'?{query.urlencode()}'}
+
+    offer_types = dict(Offer.OFFER_CHOICES)
+    facets = {
+        'category': [option('category', category_id, name, category_id)
+                     for category_id, name in categories if counts['category'][category_id]],
+        'country': [option('country', country, country, country) for country in sorted(counts['country'])
+                    if counts['country'][country]],
+        'offer_type': [option('offer_type', value, offer_types.get(value, value), value)
+                       for value in sorted(counts['offer_type']) if counts['offer_type'][value]],
+        'only_for_women': [option('only_for_women', value, 'Only for women' if value else 'Everyone',
+                                  '1' if value else '0')
+                           for value in (True, False) if counts['only_for_women'][value]],
+    }
+    return facets, total
@@ -0,0 +1,90 @@
+import math
+
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_COVERING_CELLS = 16
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, value, even = 0, 0, True
+    while len(geohash) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            geohash.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    # Geohash bits alternate longitude/latitude starting with longitude, so longitude gets the odd bit.
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_expression(latitude, longitude):
+    lat, lon = Value(math.radians(latitude)), Value(math.radians(longitude))
+    a = (
+        Sin((Radians('latitude') - lat) / 2) * Sin((Radians('latitude') - lat) / 2)
+        + Cos(lat) * Cos(Radians('latitude'))
+        * Sin((Radians('longitude') - lon) / 2) * Sin((Radians('longitude') - lon) / 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0), output_field=FloatField()))
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes whose cells together cover the bounding box of the circle, using the finest
+    precision that needs at most MAX_COVERING_CELLS of them. None means the box is too large
+    (or crosses a pole or the antimeridian) to narrow down by prefix.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = latitude - delta_lat, latitude + delta_lat
+    if south <= -90 or north >= 90:
+        return None
+    delta_lon = delta_lat / math.cos(math.radians(latitude))
+    west, east = longitude - delta_lon, longitude + delta_lon
+    if west < -180 or east >= 180:
+        return None
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = range(math.floor((south + 90) / lat_step), math.floor((north + 90) / lat_step) + 1)
+        columns = range(math.floor((west + 180) / lon_step), math.floor((east + 180) / lon_step) + 1)
+        if len(rows) * len(columns) <= MAX_COVERING_CELLS:
+            return sorted({
+                encode((row + 0.5) * lat_step - 90, (column + 0.5) * lon_step - 180, precision)
+                for row in rows for column in columns
+            })
+    return None
+
+
+def nearby_offers(offers, latitude, longitude, radius_km):
+    cells = covering_cells(latitude, longitude, radius_km)
+    offers = offers.filter(latitude__isnull=False, longitude__isnull=False)
+    if cells is not None:
+        in_cells = Q()
+        for cell in cells:
+            in_cells |= Q(geohash__startswith=cell)
+        offers = offers.filter(in_cells)
+    return offers.annotate(distance=distance_expression(latitude, longitude)).filter(distance__lte=radius_km)
@@ -0,0 +1,116 @@
+import csv
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+
+from work_and_travel_app.geo import encode
+from work_and_travel_app.models import GeocodedLocation, Offer
+from work_and_travel_app.signals import offers_changed
+
+GEOCODE_CACHE_SIZE = 4096
+
+COUNTRY_ALIASES = {
+    'usa': 'united states',
+    'us': 'united states',
+    'united states of america': 'united states',
+    'uk': 'united kingdom',
+    'great britain': 'united kingdom',
+    'england': 'united kingdom',
+    'polska': 'poland',
+    'deutschland': 'germany',
+    'espana': 'spain',
+    'czechia': 'czech republic',
+    'holland': 'netherlands',
+}
+
+
+def normalize(name):
+    name = unicodedata.normalize('NFKD', name or '')
+    # ł has no decomposition, so it would be dropped together with the combining marks.
+    name = ''.join(char for char in name if not unicodedata.combining(char)).replace('ł', 'l').replace('Ł', 'L')
+    return ' '.join(re.findall(r'[^\W_]+', name.lower()))
+
+
+def location_key(country, city):
+    country_key = normalize(country)
+    return COUNTRY_ALIASES.get(country_key, country_key), normalize(city)
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer(path):
+    places = {}
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            point = (float(row['latitude']), float(row['longitude']))
+            country = normalize(row['country'])
+            for city in [row['city'], *filter(None, (row.get('aliases') or '').split('|'))]:
+                places.setdefault((country, normalize(city)), point)
+    return places
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def _geocode_key(country_key, city_key):
+    location = GeocodedLocation.objects.filter(country_key=country_key, city_key=city_key).first()
+    if location is None:
+        point = load_gazetteer(str(settings.GAZETTEER_PATH)).get((country_key, city_key))
+        # Misses are stored too, so unknown places are not looked up in the gazetteer again.
+        location, _ = GeocodedLocation.objects.get_or_create(
+            country_key=country_key, city_key=city_key,
+            defaults={'latitude': point and point[0], 'longitude': point and point[1]},
+        )
+    if location.latitude is None:
+        return None
+    return location.latitude, location.longitude
+
+
+def geocode(country, city):
+    country_key, city_key = location_key(country, city)
+    if not country_key or not city_key:
+        return None
+    return _geocode_key(country_key, city_key)
+
+
+def clear_geocode_cache():
+    _geocode_key.cache_clear()
+    load_gazetteer.cache_clear()
+
+
+def geocode_offers(offers=None, overwrite=False, chunk_size=None):
+    """
+    Fills in coordinates of offers (a queryset or ids; all offers by default) from the gazetteer.
+    Offers that already have coordinates are skipped unless overwrite is set. Rows are streamed
+    with .iterator() and written back with one bulk_update per chunk. Returns (processed, geocoded).
+    """
+    chunk_size = chunk_size or settings.GEOCODING_CHUNK_SIZE
+    if offers is None:
+        offers = Offer.objects.all()
+    elif not hasattr(offers, 'filter'):
+        offers = Offer.objects.filter(pk__in=offers)
+    if not overwrite:
+        offers = offers.filter(latitude__isnull=True)
+
+    processed = geocoded = 0
+    chunk = []
+    rows = offers.only('id', 'country', 'city', 'latitude', 'longitude', 'geohash').order_by('id')
+    for offer in rows.iterator(chunk_size=chunk_size):
+        processed += 1
+        point = geocode(offer.country, offer.city)
+        if point is None:
+            continue
+        offer.latitude, offer.longitude = point
+        offer.geohash = encode(*point)
+        chunk.append(offer)
+        if len(chunk) >= chunk_size:
+            geocoded += _save_chunk(chunk)
+            chunk = []
+    if chunk:
+        geocoded += _save_chunk(chunk)
+    return processed, geocoded
+
+
+def _save_chunk(offers):
+    Offer.objects.bulk_update(offers, ['latitude', 'longitude', 'geohash'])
+    offers_changed.send(sender=Offer, offer_ids=[offer.id for offer in offers])
+    return len(offers)
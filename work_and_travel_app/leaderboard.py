@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from work_and_travel_app.caching import bump_version, get_version
+from work_and_travel_app.models import Grade, Message
+
+LEADERBOARD_NAMESPACE = 'leaderboard'
+
+
+class Ranking:
+    """
+    Owners of one (country, category) scope ordered by Bayesian average grade, best first. The order
+    is a sorted list of (-score, owner_id) keys, so a rank is a binary search.
+    """
+
+    def __init__(self, prior_mean, prior_weight):
+        self.prior_mean = prior_mean
+        self.prior_weight = prior_weight
+        self.totals = {}
+        self.order = []
+
+    def score(self, count, total):
+        # Few grades stay close to the scope's mean, many grades approach the owner's own average.
+        return (self.prior_weight * self.prior_mean + total) / (self.prior_weight + count)
+
+    def _key(self, owner_id):
+        count, total = self.totals[owner_id]
+        return -self.score(count, total), owner_id
+
+    def add(self, owner_id, count, total):
+        if owner_id in self.totals:
+            del self.order[bisect_left(self.order, self._key(owner_id))]
+            previous_count, previous_total = self.totals.pop(owner_id)
+            count, total = count + previous_count, total + previous_total
+        if count > 0:
+            self.totals[owner_id] = (count, total)
+            insort(self.order, self._key(owner_id))
+
+    def rank(self, owner_id):
+        if owner_id not in self.totals:
+            return None
+        return bisect_left(self.order, self._key(owner_id)) + 1
+
+    def top(self, limit):
+        return [{
+            'owner_id': owner_id,
+            'score': -score,
+            'grades': self.totals[owner_id][0],
+            'average': self.totals[owner_id][1] / self.totals[owner_id][0],
+        } for score, owner_id in self.order[:limit]]
+
+    def __len__(self):
+        return len(self.order)
+
+
+class Leaderboard:
+    """Rankings of offer owners for every country, category and country-category pair, plus overall."""
+
+    def __init__(self, version, totals):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.rankings = {}
+        overall = totals.get((None, None), {})
+        self.prior_mean = _mean(overall.values()) if overall else 0
+        for scope, owners in totals.items():
+            ranking = Ranking(_mean(owners.values()), settings.LEADERBOARD_PRIOR_WEIGHT)
+            ranking.totals = {owner_id: tuple(counts) for owner_id, counts in owners.items()}
+            ranking.order = sorted(ranking._key(owner_id) for owner_id in ranking.totals)
+            self.rankings[scope] = ranking
+
+    @classmethod
+    def build(cls, version):
+        totals = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        grades = Grade.objects.values(owner_id=F('message__offer__owner_id'), country=F('message__offer__country'))
+        for row in grades.annotate(count=Count('id'), total=Sum('grade')).order_by():
+            for scope in ((None, None), (row['country'], None)):
+                totals[scope][row['owner_id']][0] += row['count']
+                totals[scope][row['owner_id']][1] += row['total']
+        by_category = grades.filter(message__offer__category__isnull=False).values(
+            'owner_id', 'country', category_id=F('message__offer__category')
+        )
+        for row in by_category.annotate(count=Count('id'), total=Sum('grade')).order_by():
+            for scope in ((None, row['category_id']), (row['country'], row['category_id'])):
+                totals[scope][row['owner_id']][0] += row['count']
+                totals[scope][row['owner_id']][1] += row['total']
+        return cls(version, totals)
+
+    def ranking(self, country=None, category_id=None):
+        return self.rankings.get((country or None, category_id or None))
+
+    def countries(self):
+        return sorted(country for country, category_id in self.rankings if country and category_id is None)
+
+    def category_ids(self):
+        return {category_id for country, category_id in self.rankings if category_id}
+
+    def record(self, owner_id, scopes, count, total):
+        for scope in scopes:
+            if scope not in self.rankings:
+                # New scopes start from the overall mean until the next rebuild.
+                self.rankings[scope] = Ranking(self.prior_mean, settings.LEADERBOARD_PRIOR_WEIGHT)
+            self.rankings[scope].add(owner_id, count, total)
+
+    def catch_up(self, version):
+        """
+        Applies the changes recorded by all processes between this leaderboard's version and the given
+        one. Returns False when they are no longer (or not yet) all in the cache and a rebuild is needed.
+        """
+        if not 0 < version - self.version <= settings.LEADERBOARD_MAX_CHANGES:
+            return False
+        keys = [_change_key(number) for number in range(self.version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        for key in keys:
+            self.record(*changes[key])
+        self.version = version
+        return True
+
+
+def _mean(counts):
+    count, total = map(sum, zip(*counts))
+    return total / count if count else 0
+
+
+def _change_key(version):
+    return f'{LEADERBOARD_NAMESPACE}:change:{version}'
+
+
+_leaderboard = None
+_lock = threading.Lock()
+
+
+def get_leaderboard():
+    """
+    The process-wide leaderboard. Changes made by other processes are applied from the cache when the
+    version moved on; it is rebuilt when they cannot be, or when it is older than LEADERBOARD_MAX_AGE
+    (which also refreshes the priors and picks up edited offer countries).
+    """
+    global _leaderboard
+    version = get_version(LEADERBOARD_NAMESPACE)
+    with _lock:
+        if (_leaderboard is None or time.monotonic() - _leaderboard.built_at > settings.LEADERBOARD_MAX_AGE
+                or _leaderboard.version != version and not _leaderboard.catch_up(version)):
+            _leaderboard = Leaderboard.build(version)
+        return _leaderboard
+
+
+def grade_scopes(message_id):
+    """The owner a grade of the message counts towards and the leaderboard scopes it belongs to."""
+    rows = Message.objects.filter(pk=message_id).values_list('offer__owner_id', 'offer__country', 'offer__category')
+    scopes = {(None, None)}
+    owner_id = None
+    for owner_id, country, category_id in rows:
+        scopes.add((country, None))
+        if category_id:
+            scopes.update({(None, category_id), (country, category_id)})
+    return owner_id, scopes
+
+
+def record_grade(owner_scopes, previous=None, current=None):
+    """
+    Moves one grade of an owner from the previous to the current value (either may be None) once the
+    transaction commits, so a rollback leaves the rankings alone and other processes never rebuild from
+    uncommitted grades.
+    """
+    owner_id, scopes = owner_scopes
+    if owner_id is None or previous == current:
+        return
+    count = (current is not None) - (previous is not None)
+    change = (owner_id, list(scopes), count, (current or 0) - (previous or 0))
+    transaction.on_commit(partial(_publish_change, change))
+
+
+def invalidate_leaderboard():
+    # A version without a stored change makes every process rebuild, after the commit.
+    transaction.on_commit(partial(bump_version, LEADERBOARD_NAMESPACE))
+
+
+def _publish_change(change):
+    global _leaderboard
+    # Each change is stored under the version it bumps to, so the other processes catch up by reading
+    # the changes instead of rebuilding. One read just between the bump and the set rebuilds instead.
+    version = bump_version(LEADERBOARD_NAMESPACE)
+    cache.set(_change_key(version), change, settings.LEADERBOARD_MAX_AGE)
+    with _lock:
+        if _leaderboard is not None and _leaderboard.version != version and not _leaderboard.catch_up(version):
+            _leaderboard = None
@@ -0,0 +1,75 @@
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, Count, FloatField, Max, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from work_and_travel_app.search import is_postgres
+
+SIMILARITY_THRESHOLD = 0.3
+
+
+def trigrams(text):
+    # Same trigram set pg_trgm builds: lower-cased words padded with two leading and one trailing space.
+    result = set()
+    for word in re.findall(r'[^\W_]+', text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(first, second):
+    first, second = trigrams(first), trigrams(second)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _similar_values(offers, field, text):
+    values = offers.order_by().values_list(field, flat=True).distinct()
+    scores = {value: similarity(text, value) for value in values}
+    return {value: score for value, score in scores.items() if score >= SIMILARITY_THRESHOLD}
+
+
+def _score_case(field, scores):
+    return Case(
+        *[When(**{field: value}, then=Value(score)) for value, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def fuzzy_location_offers(offers, text):
+    text = text.strip()
+    no_match = offers.annotate(location_similarity=Value(0.0)).none()
+    if not text:
+        return no_match
+
+    if is_postgres(offers):
+        return offers.filter(
+            Q(country__trigram_similar=text) | Q(city__trigram_similar=text)
+        ).annotate(
+            location_similarity=Cast(
+                Greatest(TrigramSimilarity('country', text), TrigramSimilarity('city', text)), FloatField()
+            )
+        ).order_by('-location_similarity', 'id')
+
+    countries = _similar_values(offers, 'country', text)
+    cities = _similar_values(offers, 'city', text)
+    if not countries and not cities:
+        return no_match
+
+    return offers.filter(
+        Q(country__in=countries) | Q(city__in=cities)
+    ).annotate(
+        location_similarity=Greatest(_score_case('country', countries), _score_case('city', cities))
+    ).order_by('-location_similarity', 'id')
+
+
+def match_locations(offers, text, limit=10):
+    return list(
+        fuzzy_location_offers(offers, text).values('country', 'city').annotate(
+            similarity=Max('location_similarity'),
+            offers=Count('id'),
+        ).order_by('-similarity', '-offers', 'country', 'city')[:limit]
+    )
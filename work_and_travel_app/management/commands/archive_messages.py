@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from work_and_travel_app.archive import archive_conversations
+
+
+class Command(BaseCommand):
+    help = 'Moves messages of idle conversations on inactive offers into the compressed archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MESSAGE_ARCHIVE_AFTER_DAYS,
+                            help='Archive conversations without messages for longer than this many days.')
+        parser.add_argument('--chunk-size', type=int, default=settings.MESSAGE_ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        conversations, messages = archive_conversations(options['days'], options['chunk_size'])
+        self.stdout.write(f'Archived {messages} messages from {conversations} conversations.')
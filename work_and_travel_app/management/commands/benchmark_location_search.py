@@ -0,0 +1,69 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from work_and_travel_app.locations import fuzzy_location_offers
+from work_and_travel_app.models import Offer
+
+LOCATIONS = [
+    ('Poland', 'Warsaw'), ('Poland', 'Krakow'), ('Poland', 'Gdansk'), ('Germany', 'Berlin'),
+    ('Germany', 'Munich'), ('Spain', 'Barcelona'), ('Spain', 'Madrid'), ('Canada', 'Toronto'),
+    ('Canada', 'Vancouver'), ('UK', 'London'), ('Portugal', 'Lisbon'), ('Italy', 'Rome'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compares the fuzzy location matcher with the country__icontains search it replaced.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=['Polnd', 'Warszawa', 'warsaw ', 'Poland'])
+        parser.add_argument('--offers', type=int, default=0,
+                            help='Seed this many synthetic offers for the run (rolled back afterwards).')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['offers']:
+                self.seed(options['offers'])
+
+            offers = Offer.objects.filter(is_active=True)
+            self.stdout.write(f"{'query':<16}{'path':<12}{'hits':>8}{'avg ms':>10}")
+            for query in options['queries']:
+                paths = [
+                    ('icontains', lambda: offers.filter(country__icontains=query).order_by('id')),
+                    ('fuzzy', lambda: fuzzy_location_offers(offers, query)),
+                ]
+                for name, build in paths:
+                    hits, elapsed = self.measure(build, options['repeat'], options['limit'])
+                    self.stdout.write(f'{query!r:<16}{name:<12}{hits:>8}{elapsed:>10.2f}')
+
+            transaction.set_rollback(True)
+
+    def measure(self, build, repeat, limit):
+        hits = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hits = len(list(build()[:limit]))
+        return hits, (time.perf_counter() - start) * 1000 / repeat
+
+    def seed(self, count):
+        owner = User.objects.create_user(username=f'benchmark-{time.time_ns()}')
+        today = date.today()
+        Offer.objects.bulk_create([
+            Offer(
+                name=f'Benchmark offer {i}',
+                country=country,
+                city=city,
+                description='Synthetic offer created by benchmark_location_search.',
+                offer_type='job offer',
+                since_when=today,
+                until_when=today + timedelta(days=30),
+                owner=owner,
+            )
+            for i, (country, city) in enumerate(random.choice(LOCATIONS) for _ in range(count))
+        ], batch_size=1000)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from work_and_travel_app.reputation import check_reputations
+
+
+class Command(BaseCommand):
+    help = 'Compares stored user reputations with aggregates of the Grade and Answer tables.'
+
+    def handle(self, *args, **options):
+        differences = check_reputations()
+        for user_id, field, stored, live in differences:
+            self.stdout.write(f'User {user_id}: {field} is {stored}, expected {live}.')
+        if differences:
+            raise CommandError(f'{len(differences)} differences found, run rebuild_reputation to fix them.')
+        self.stdout.write('Reputations are consistent.')
@@ -0,0 +1,19 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from work_and_travel_app.expiry import deactivate_expired_offers
+
+
+class Command(BaseCommand):
+    help = 'Deactivates offers whose until_when date has passed, in batches of short UPDATE statements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OFFER_EXPIRY_BATCH_SIZE)
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='Treat offers ending before this date (YYYY-MM-DD) as expired. Defaults to today.')
+
+    def handle(self, *args, **options):
+        count = deactivate_expired_offers(today=options['date'], batch_size=options['batch_size'])
+        self.stdout.write(f'Deactivated {count} expired offers.')
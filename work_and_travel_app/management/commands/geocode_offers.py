@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from work_and_travel_app.geocoding import geocode_offers
+
+
+class Command(BaseCommand):
+    help = 'Fills in offer coordinates from the local gazetteer, streaming offers in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.GEOCODING_CHUNK_SIZE)
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Geocode offers that already have coordinates as well.')
+
+    def handle(self, *args, **options):
+        processed, geocoded = geocode_offers(overwrite=options['overwrite'], chunk_size=options['chunk_size'])
+        self.stdout.write(f'Geocoded {geocoded} of {processed} offers.')
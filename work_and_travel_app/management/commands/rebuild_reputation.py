@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from work_and_travel_app.reputation import rebuild_reputations
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every user reputation from the Grade and Answer tables.'
+
+    def handle(self, *args, **options):
+        count = rebuild_reputations()
+        self.stdout.write(f'Rebuilt reputation of {count} users.')
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:34
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from work_and_travel_app.operations import RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0015_alter_baseinformation_date_of_birth_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        RunPostgresSQL(
+            sql="""
+                UPDATE work_and_travel_app_offer o SET search_vector =
+                    setweight(to_tsvector('simple'::regconfig, COALESCE(o.name, '')), 'A')
+                    || setweight(to_tsvector('simple'::regconfig, COALESCE(o.country, '') || ' ' || COALESCE(o.city, '')), 'B')
+                    || setweight(to_tsvector('simple'::regconfig, COALESCE((
+                        SELECT string_agg(c.name, ' ')
+                        FROM work_and_travel_app_offer_category oc
+                        JOIN work_and_travel_app_category c ON c.id = oc.category_id
+                        WHERE oc.offer_id = o.id
+                    ), '')), 'B')
+                    || setweight(to_tsvector('simple'::regconfig, COALESCE(o.description, '')), 'C');
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        RunPostgresSQL(
+            sql='CREATE INDEX offer_search_vector_gin ON work_and_travel_app_offer USING gin (search_vector) '
+                'WHERE is_active;',
+            reverse_sql='DROP INDEX offer_search_vector_gin;',
+        ),
+    ]
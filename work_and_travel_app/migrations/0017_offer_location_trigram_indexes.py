@@ -0,0 +1,25 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from work_and_travel_app.operations import RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0016_offer_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        RunPostgresSQL(
+            sql='CREATE INDEX offer_country_trgm ON work_and_travel_app_offer USING gin (country gin_trgm_ops) '
+                'WHERE is_active;',
+            reverse_sql='DROP INDEX offer_country_trgm;',
+        ),
+        RunPostgresSQL(
+            sql='CREATE INDEX offer_city_trgm ON work_and_travel_app_offer USING gin (city gin_trgm_ops) '
+                'WHERE is_active;',
+            reverse_sql='DROP INDEX offer_city_trgm;',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0017_offer_location_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['offer', 'sender', 'time'], name='message_offer_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['offer', 'receiver', 'time'], name='message_offer_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['since_when', 'id'], name='offer_active_since_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['country', 'offer_type', 'only_for_women'], name='offer_active_facets_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['owner', 'until_when'], name='offer_owner_until_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0020_offer_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country_key', models.CharField(max_length=200)),
+                ('city_key', models.CharField(max_length=100)),
+                ('latitude', models.FloatField(null=True)),
+                ('longitude', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geocodedlocation',
+            constraint=models.UniqueConstraint(fields=('country_key', 'city_key'), name='geocoded_location_key_unique'),
+        ),
+    ]
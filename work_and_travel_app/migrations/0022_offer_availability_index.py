@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from work_and_travel_app.operations import RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0021_geocoded_location'),
+    ]
+
+    operations = [
+        # Offers whose until_when precedes since_when are treated as available on since_when only, so
+        # daterange() never receives an inverted range.
+        RunPostgresSQL(
+            sql="CREATE INDEX offer_active_availability_gist ON work_and_travel_app_offer USING gist "
+                "(daterange(since_when, GREATEST(since_when, until_when), '[]')) WHERE is_active;",
+            reverse_sql='DROP INDEX offer_active_availability_gist;',
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('work_and_travel_app', 'Message')
+    Conversation = apps.get_model('work_and_travel_app', 'Conversation')
+
+    conversations = {}
+    messages = Message.objects.values_list('id', 'offer_id', 'offer__owner_id', 'sender_id', 'receiver_id', 'time')
+    for message_id, offer_id, owner_id, sender_id, receiver_id, time in messages.order_by('time', 'id').iterator():
+        applicant_id = receiver_id if sender_id == owner_id else sender_id
+        # Existing history counts as read.
+        conversations[(offer_id, applicant_id)] = Conversation(
+            offer_id=offer_id, applicant_id=applicant_id, owner_id=owner_id,
+            last_message_id=message_id, last_activity=time,
+        )
+    Conversation.objects.bulk_create(conversations.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('work_and_travel_app', '0022_offer_availability_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity', models.DateTimeField()),
+                ('owner_unread', models.PositiveIntegerField(default=0)),
+                ('applicant_unread', models.PositiveIntegerField(default=0)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applicant_conversations', to=settings.AUTH_USER_MODEL)),
+                ('last_message', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='work_and_travel_app.message')),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='work_and_travel_app.offer')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-last_activity'], name='conv_owner_activity_idx'), models.Index(fields=['applicant', '-last_activity'], name='conv_applicant_activity_idx'), models.Index(fields=['offer', '-last_activity'], name='conv_offer_activity_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('offer', 'applicant'), name='conversation_offer_applicant_unique'),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
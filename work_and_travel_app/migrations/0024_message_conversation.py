@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_messages(apps, schema_editor):
+    Conversation = apps.get_model('work_and_travel_app', 'Conversation')
+    Message = apps.get_model('work_and_travel_app', 'Message')
+
+    # Every message of a conversation is between the offer owner and the applicant.
+    for conversation_id, offer_id, applicant_id in Conversation.objects.values_list('id', 'offer_id', 'applicant_id'):
+        Message.objects.filter(
+            models.Q(sender_id=applicant_id) | models.Q(receiver_id=applicant_id), offer_id=offer_id
+        ).update(conversation_id=conversation_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0023_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='work_and_travel_app.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'time', 'id'], name='message_conversation_time_idx'),
+        ),
+        migrations.RunPython(link_messages, migrations.RunPython.noop),
+    ]
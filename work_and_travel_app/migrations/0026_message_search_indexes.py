@@ -0,0 +1,27 @@
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations
+
+from work_and_travel_app.operations import RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0025_conversation_read_at'),
+    ]
+
+    operations = [
+        # btree_gin lets the user column share a GIN index with the message's tsvector, so inbox search
+        # only visits the postings of one user instead of filtering all matching messages.
+        BtreeGinExtension(),
+        RunPostgresSQL(
+            sql="CREATE INDEX message_sender_fts ON work_and_travel_app_message USING gin "
+                "(sender_id, to_tsvector('simple'::regconfig, COALESCE(message, ''::text)));",
+            reverse_sql='DROP INDEX message_sender_fts;',
+        ),
+        RunPostgresSQL(
+            sql="CREATE INDEX message_receiver_fts ON work_and_travel_app_message USING gin "
+                "(receiver_id, to_tsvector('simple'::regconfig, COALESCE(message, ''::text)));",
+            reverse_sql='DROP INDEX message_receiver_fts;',
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+from work_and_travel_app.operations import RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0026_message_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conversation_id', models.BigIntegerField()),
+                ('offer_id', models.BigIntegerField()),
+                ('owner_id', models.BigIntegerField()),
+                ('applicant_id', models.BigIntegerField()),
+                ('first_message_time', models.DateTimeField()),
+                ('last_message_time', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation_id', '-last_message_time'], name='archive_conversation_idx'), models.Index(fields=['offer_id'], name='archive_offer_idx')],
+            },
+        ),
+        # Recreated as a range-partitioned table while it is still empty. PostgreSQL requires the partition
+        # key in the primary key; ids stay unique because they all come from the one identity sequence.
+        # Yearly partitions are created by the archive_messages command before it writes into them.
+        RunPostgresSQL(
+            sql=[
+                'DROP TABLE work_and_travel_app_archivedconversation;',
+                '''
+                CREATE TABLE work_and_travel_app_archivedconversation (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY,
+                    conversation_id bigint NOT NULL,
+                    offer_id bigint NOT NULL,
+                    owner_id bigint NOT NULL,
+                    applicant_id bigint NOT NULL,
+                    first_message_time timestamp with time zone NOT NULL,
+                    last_message_time timestamp with time zone NOT NULL,
+                    message_count integer NOT NULL CHECK (message_count >= 0),
+                    payload bytea NOT NULL,
+                    archived_at timestamp with time zone NOT NULL,
+                    PRIMARY KEY (id, last_message_time)
+                ) PARTITION BY RANGE (last_message_time);
+                ''',
+                'CREATE INDEX archive_conversation_idx ON work_and_travel_app_archivedconversation '
+                '(conversation_id, last_message_time DESC);',
+                'CREATE INDEX archive_offer_idx ON work_and_travel_app_archivedconversation (offer_id);',
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F, Q, Sum
+
+
+def backfill_reputations(apps, schema_editor):
+    Grade = apps.get_model('work_and_travel_app', 'Grade')
+    Answer = apps.get_model('work_and_travel_app', 'Answer')
+    Reputation = apps.get_model('work_and_travel_app', 'Reputation')
+
+    reputations = {}
+    for kind, ratings, field, owner in (
+        ('grade', Grade.objects, 'grade', 'message__offer__owner_id'),
+        ('answer', Answer.objects, 'grade_answer', 'answer__message__offer__owner_id'),
+    ):
+        rows = ratings.values(owner_id=F(owner)).annotate(
+            count=Count('id'), total=Sum(field),
+            **{f'value_{value}': Count('id', filter=Q(**{field: value})) for value in range(1, 6)},
+        ).order_by()
+        for row in rows:
+            reputation = reputations.setdefault(row['owner_id'], Reputation(user_id=row['owner_id']))
+            setattr(reputation, f'{kind}s_count', row['count'])
+            setattr(reputation, f'{kind}s_sum', row['total'])
+            for value in range(1, 6):
+                setattr(reputation, f'{kind}_{value}', row[f'value_{value}'])
+    Reputation.objects.bulk_create(reputations.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('work_and_travel_app', '0027_archived_conversation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reputation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('grades_count', models.PositiveIntegerField(default=0)),
+                ('grades_sum', models.PositiveIntegerField(default=0)),
+                ('grade_1', models.PositiveIntegerField(default=0)),
+                ('grade_2', models.PositiveIntegerField(default=0)),
+                ('grade_3', models.PositiveIntegerField(default=0)),
+                ('grade_4', models.PositiveIntegerField(default=0)),
+                ('grade_5', models.PositiveIntegerField(default=0)),
+                ('answers_count', models.PositiveIntegerField(default=0)),
+                ('answers_sum', models.PositiveIntegerField(default=0)),
+                ('answer_1', models.PositiveIntegerField(default=0)),
+                ('answer_2', models.PositiveIntegerField(default=0)),
+                ('answer_3', models.PositiveIntegerField(default=0)),
+                ('answer_4', models.PositiveIntegerField(default=0)),
+                ('answer_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_reputations, migrations.RunPython.noop),
+    ]
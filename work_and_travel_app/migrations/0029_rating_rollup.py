@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:14
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+
+
+def backfill_ratings(apps, schema_editor):
+    Message = apps.get_model('work_and_travel_app', 'Message')
+    Grade = apps.get_model('work_and_travel_app', 'Grade')
+    Answer = apps.get_model('work_and_travel_app', 'Answer')
+    RatingRollup = apps.get_model('work_and_travel_app', 'RatingRollup')
+
+    # Existing ratings are dated by the rated message and answers by their grade.
+    Grade.objects.update(created=Subquery(Message.objects.filter(pk=OuterRef('message_id')).values('time')[:1]))
+    Answer.objects.update(created=Subquery(Grade.objects.filter(pk=OuterRef('answer_id')).values('created')[:1]))
+
+    rollups = []
+    for kind, ratings, field, path in (
+        ('grade', Grade.objects, 'grade', 'message__offer'),
+        ('answer', Answer.objects, 'grade_answer', 'answer__message__offer'),
+    ):
+        rows = ratings.values(
+            owner_id=F(f'{path}__owner_id'), offer_id=F(f'{path}_id'), day=TruncDate('created'), value=F(field)
+        ).annotate(count=Count('id')).order_by()
+        rollups.extend(RatingRollup(kind=kind, **row) for row in rows)
+    RatingRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('work_and_travel_app', '0028_reputation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='grade',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RatingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('grade', 'Grade'), ('answer', 'Answer')], max_length=6)),
+                ('value', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='work_and_travel_app.offer')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'day'], name='rating_rollup_owner_day_idx'), models.Index(fields=['offer', 'day'], name='rating_rollup_offer_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ratingrollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'offer', 'day', 'kind', 'value'), name='rating_rollup_unique'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
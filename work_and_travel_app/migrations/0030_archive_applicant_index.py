@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('work_and_travel_app', '0029_rating_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedconversation',
+            index=models.Index(fields=['applicant_id'], name='archive_applicant_idx'),
+        ),
+    ]
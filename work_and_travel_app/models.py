@@ -1,6 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -44,28 +46,129 @@ class Offer(models.Model):
     only_for_women = models.BooleanField(default=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['since_when', 'id'], condition=models.Q(is_active=True),
+                         name='offer_active_since_idx'),
+            models.Index(fields=['country', 'offer_type', 'only_for_women'], condition=models.Q(is_active=True),
+                         name='offer_active_facets_idx'),
+            models.Index(fields=['owner', 'until_when'], name='offer_owner_until_idx'),
+            models.Index(fields=['until_when'], condition=models.Q(is_active=True), name='offer_active_until_idx'),
+            models.Index(fields=['geohash'], condition=models.Q(is_active=True), opclasses=['varchar_pattern_ops'],
+                         name='offer_active_geohash_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
 
 
+class GeocodedLocation(models.Model):
+    country_key = models.CharField(max_length=200)
+    city_key = models.CharField(max_length=100)
+    latitude = models.FloatField(null=True)
+    longitude = models.FloatField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['country_key', 'city_key'], name='geocoded_location_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.city_key}, {self.country_key}"
+
+
 class Message(models.Model):
     message = models.TextField()
     time = models.DateTimeField(auto_now_add=True)
     receiver = models.ForeignKey(User, related_name='received_messages', on_delete=models.CASCADE)
     sender = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     offer = models.ForeignKey(Offer, on_delete=models.CASCADE)
+    conversation = models.ForeignKey('Conversation', null=True, blank=True, related_name='messages',
+                                     on_delete=models.CASCADE, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['offer', 'sender', 'time'], name='message_offer_sender_idx'),
+            models.Index(fields=['offer', 'receiver', 'time'], name='message_offer_receiver_idx'),
+            models.Index(fields=['conversation', 'time', 'id'], name='message_conversation_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender}  {self.receiver} {self.offer}"
 
 
+class Conversation(models.Model):
+    offer = models.ForeignKey(Offer, on_delete=models.CASCADE)
+    applicant = models.ForeignKey(User, related_name='applicant_conversations', on_delete=models.CASCADE)
+    owner = models.ForeignKey(User, related_name='owner_conversations', on_delete=models.CASCADE)
+    last_message = models.ForeignKey(Message, null=True, related_name='+', on_delete=models.SET_NULL)
+    last_activity = models.DateTimeField()
+    owner_unread = models.PositiveIntegerField(default=0)
+    applicant_unread = models.PositiveIntegerField(default=0)
+    owner_read_at = models.DateTimeField(null=True, blank=True)
+    applicant_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['offer', 'applicant'], name='conversation_offer_applicant_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-last_activity'], name='conv_owner_activity_idx'),
+            models.Index(fields=['applicant', '-last_activity'], name='conv_applicant_activity_idx'),
+            models.Index(fields=['offer', '-last_activity'], name='conv_offer_activity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.offer} {self.applicant}"
+
+    def partner(self, user):
+        return self.applicant if user.id == self.owner_id else self.owner
+
+    def unread(self, user):
+        return self.owner_unread if user.id == self.owner_id else self.applicant_unread
+
+    def partner_read_at(self, user):
+        return self.applicant_read_at if user.id == self.owner_id else self.owner_read_at
+
+
+class ArchivedConversation(models.Model):
+    # Plain ids instead of foreign keys, as the table is range-partitioned by last_message_time on
+    # PostgreSQL (migration 0027). Rows of deleted offers and applicants are purged by receivers.
+    conversation_id = models.BigIntegerField()
+    offer_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField()
+    applicant_id = models.BigIntegerField()
+    first_message_time = models.DateTimeField()
+    last_message_time = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    # zlib-compressed JSON list of the archived messages
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation_id', '-last_message_time'], name='archive_conversation_idx'),
+            models.Index(fields=['offer_id'], name='archive_offer_idx'),
+            models.Index(fields=['applicant_id'], name='archive_applicant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.conversation_id} {self.first_message_time} - {self.last_message_time}"
+
+
 class Grade(models.Model):
     grade = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)],
                                 help_text="Rating must be between 1 to 5")
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     description = models.TextField(max_length=255)
     message = models.ForeignKey(Message, on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f'{self.grade} {self.user.first_name} {self.message.offer.name}'
@@ -76,6 +179,77 @@ class Answer(models.Model):
     grade_answer = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)],
                                        help_text="Rating must be between 1 to 5")
     text = models.TextField(max_length=255)
+    created = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f'{self.answer} {self.grade_answer}'
+
+
+class Reputation(models.Model):
+    # Ratings are credited to the owner of the rated message's offer, like the profile's averages.
+    # Kept up to date by the Grade and Answer receivers; rebuild_reputation recomputes it from scratch.
+    user = models.OneToOneField(User, primary_key=True, on_delete=models.CASCADE)
+    grades_count = models.PositiveIntegerField(default=0)
+    grades_sum = models.PositiveIntegerField(default=0)
+    grade_1 = models.PositiveIntegerField(default=0)
+    grade_2 = models.PositiveIntegerField(default=0)
+    grade_3 = models.PositiveIntegerField(default=0)
+    grade_4 = models.PositiveIntegerField(default=0)
+    grade_5 = models.PositiveIntegerField(default=0)
+    answers_count = models.PositiveIntegerField(default=0)
+    answers_sum = models.PositiveIntegerField(default=0)
+    answer_1 = models.PositiveIntegerField(default=0)
+    answer_2 = models.PositiveIntegerField(default=0)
+    answer_3 = models.PositiveIntegerField(default=0)
+    answer_4 = models.PositiveIntegerField(default=0)
+    answer_5 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} {self.average:.2f}"
+
+    @property
+    def grades_average(self):
+        return self.grades_sum / self.grades_count if self.grades_count else 0
+
+    @property
+    def answers_average(self):
+        return self.answers_sum / self.answers_count if self.answers_count else 0
+
+    @property
+    def average(self):
+        return (self.grades_average + self.answers_average) / 2
+
+    @property
+    def grades_histogram(self):
+        return [getattr(self, f'grade_{value}') for value in range(1, 6)]
+
+    @property
+    def answers_histogram(self):
+        return [getattr(self, f'answer_{value}') for value in range(1, 6)]
+
+
+class RatingRollup(models.Model):
+    # Daily number of ratings per (owner, offer, kind, value), kept up to date by the Grade and Answer
+    # receivers, so rating analytics read these rows instead of the ratings themselves.
+    KIND_CHOICES = [
+        ('grade', 'Grade'),
+        ('answer', 'Answer'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    offer = models.ForeignKey(Offer, on_delete=models.CASCADE)
+    day = models.DateField()
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    value = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'offer', 'day', 'kind', 'value'], name='rating_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'day'], name='rating_rollup_owner_day_idx'),
+            models.Index(fields=['offer', 'day'], name='rating_rollup_offer_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.offer} {self.day} {self.kind} {self.value}: {self.count}"
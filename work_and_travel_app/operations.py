@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class RunPostgresSQL(migrations.RunSQL):
+    """RunSQL that is skipped on databases other than PostgreSQL (e.g. SQLite test runs)."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+              for value in values]
+    data = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def get_page_size(request, default, maximum):
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        return default
+    return min(max(page_size, 1), maximum)
+
+
+class KeysetPage(Sequence):
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginates over a unique, non-null ordering (e.g. ('since_when', 'id')) with cursors instead of
+    OFFSET, so every page is a single range query and no COUNT(*) is needed.
+    """
+
+    def __init__(self, object_list, ordering, per_page):
+        self.object_list = object_list
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return self.object_list.count()
+
+    @cached_property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    def get_page(self, after=None, before=None):
+        try:
+            return self.page(after=after, before=before)
+        except (ValueError, ValidationError, TypeError):
+            # Broken cursors (InvalidCursor) as well as cursor values of the wrong type for their field.
+            return self.page()
+
+    def page(self, after=None, before=None):
+        if before:
+            return self._page_before(decode_cursor(before))
+
+        queryset = self.object_list
+        if after:
+            queryset = queryset.filter(self._seek(decode_cursor(after), reverse=False))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        object_list = rows[:self.per_page]
+
+        return KeysetPage(
+            object_list,
+            self,
+            next_cursor=self.cursor(object_list[-1]) if len(rows) > self.per_page else None,
+            previous_cursor=self.cursor(object_list[0]) if after and object_list else None,
+        )
+
+    def _page_before(self, values):
+        rows = list(
+            self.object_list.filter(self._seek(values, reverse=True)).order_by(
+                *[self._reverse(field) for field in self.ordering]
+            )[:self.per_page + 1]
+        )
+        if not rows:
+            return self.page()
+        object_list = rows[:self.per_page][::-1]
+
+        return KeysetPage(
+            object_list,
+            self,
+            next_cursor=self.cursor(object_list[-1]),
+            previous_cursor=self.cursor(object_list[0]) if len(rows) > self.per_page else None,
+        )
+
+    def cursor(self, obj):
+        return encode_cursor([getattr(obj, field.lstrip('-')) for field in self.ordering])
+
+    def _seek(self, values, reverse):
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            equal = {other.lstrip('-'): value for other, value in zip(self.ordering[:position], values)}
+            condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+        return condition
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,97 @@
+import math
+import re
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+LOCK_TIMEOUT = 1
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.005
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'30/m' -> (30, 60): a bucket of 30 tokens refilled at 30 tokens per minute."""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d*)\s*([smhd])\w*\s*', rate)
+    if not match or not int(match[1]):
+        raise ValueError(f'Invalid rate: {rate!r}')
+    return int(match[1]), int(match[2] or 1) * PERIODS[match[3]]
+
+
+def rate_limit_key(scope, ident):
+    return f'ratelimit:{scope}:{ident}'
+
+
+def take_token(scope, ident):
+    """
+    Takes a token from the ident's bucket for the scope, as configured in settings.RATE_LIMITS.
+    Returns 0 when the request may proceed, otherwise the seconds until a token is available.
+    The bucket is one cache entry, updated under a short lock so concurrent requests cannot take the
+    same token.
+    """
+    rate = settings.RATE_LIMITS.get(scope)
+    if not rate:
+        return 0
+    capacity, period = parse_rate(rate)
+    key = rate_limit_key(scope, ident)
+
+    with bucket_lock(key) as locked:
+        now = time.time()
+        if not locked:
+            # The lock is held by a request that is still busy, refuse rather than share its token.
+            return period / capacity
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * capacity / period)
+        wait = 0 if tokens >= 1 else (1 - tokens) * period / capacity
+        # An untouched bucket is full again after one period, so the entry may expire then.
+        cache.set(key, (tokens - 1 if not wait else tokens, now), math.ceil(period))
+    return wait
+
+
+@contextmanager
+def bucket_lock(key):
+    """
+    cache.add() is atomic, so only one request at a time owns the lock. It expires after
+    LOCK_TIMEOUT seconds in case its owner never releases it.
+    """
+    lock_key = f'{key}:lock'
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                yield True
+            finally:
+                cache.delete(lock_key)
+            return
+        time.sleep(LOCK_WAIT)
+    yield False
+
+
+def client_ident(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.id}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def too_many_requests(wait):
+    response = HttpResponse('Too many requests, please try again later.', status=429)
+    response['Retry-After'] = str(max(math.ceil(wait), 1))
+    return response
+
+
+class RateLimitMixin:
+    """Answers 429 with Retry-After once the client used up its rate_limit_scope bucket."""
+    rate_limit_scope = None
+    rate_limit_methods = ('POST',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.rate_limit_methods:
+            wait = take_token(self.rate_limit_scope, client_ident(request))
+            if wait:
+                return too_many_requests(wait)
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,186 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from work_and_travel_app.analytics import rebuild_rollups, record_rollup
+from work_and_travel_app.archive import purge_archives
+from work_and_travel_app.autocomplete import invalidate_location_index, remove_from_location_index, \
+    update_location_index
+from work_and_travel_app.conversations import get_unread_total, record_message
+from work_and_travel_app.facets import invalidate_facets
+from work_and_travel_app.geo import encode
+from work_and_travel_app.leaderboard import grade_scopes, invalidate_leaderboard, record_grade
+from work_and_travel_app.models import Answer, Category, Grade, Message, Offer
+from work_and_travel_app.reputation import RATING_KINDS, cascading_rating_owner_ids, rating_target, \
+    rebuild_reputations, record_rating
+from work_and_travel_app.search import update_search_vectors
+from work_and_travel_app.signals import offers_changed
+
+
+@receiver(pre_save, sender=Offer)
+def offer_geohash(sender, instance, raw=False, **kwargs):
+    if instance.latitude is None or instance.longitude is None:
+        instance.geohash = ''
+    else:
+        instance.geohash = encode(instance.latitude, instance.longitude)
+
+
+@receiver(post_save, sender=Offer)
+def offer_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_vectors([instance.pk])
+    invalidate_facets()
+    update_location_index(instance)
+
+
+@receiver(post_delete, sender=Offer)
+def offer_deleted(sender, instance, **kwargs):
+    invalidate_facets()
+    remove_from_location_index(instance.pk)
+    purge_archives(offer_id=instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # The user's own offers are purged as they cascade, this covers conversations they applied in.
+    purge_archives(applicant_id=instance.pk)
+
+
+@receiver(offers_changed)
+def offers_bulk_changed(sender, offer_ids, **kwargs):
+    invalidate_facets()
+    invalidate_location_index()
+
+
+@receiver(m2m_changed, sender=Offer.category.through)
+def offer_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_offer_ids = list(instance.offer_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        update_search_vectors(instance._cleared_offer_ids)
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(list(pk_set))
+
+    if action.startswith('post_'):
+        invalidate_facets()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        update_search_vectors(list(instance.offer_set.values_list('id', flat=True)))
+    invalidate_facets()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    invalidate_facets()
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_message(instance)
+
+
+def _rating_kind(sender):
+    return 'grade' if sender is Grade else 'answer'
+
+
+@receiver(pre_save, sender=Grade)
+@receiver(pre_save, sender=Answer)
+def rating_changing(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    _, field, owner, offer = RATING_KINDS[_rating_kind(sender)]
+    instance._previous_rating = sender.objects.filter(pk=instance.pk).values_list(
+        owner, offer, field, 'created'
+    ).first()
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_save, sender=Answer)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    kind = _rating_kind(sender)
+    value = getattr(instance, RATING_KINDS[kind][1])
+    previous = getattr(instance, '_previous_rating', None)
+    if previous:
+        owner_id, offer_id, previous_value, previous_created = previous
+        record_rating(kind, owner_id, previous_value, sign=-1)
+        record_rollup(kind, owner_id, offer_id, previous_created, previous_value, sign=-1)
+    owner_id, offer_id = rating_target(kind, instance)
+    record_rating(kind, owner_id, value)
+    record_rollup(kind, owner_id, offer_id, instance.created, value)
+    if kind == 'grade':
+        record_grade(grade_scopes(instance.message_id), previous[2] if previous else None, instance.grade)
+    instance._previous_rating = None
+
+
+def _deleted_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _bulk_rating_delete(origin):
+    # Ratings deleted along with offers or users are accounted for in bulk by offer_deleting and
+    # user_deleting, so the per-row bookkeeping below is skipped for them.
+    return _deleted_model(origin) in (Offer, User)
+
+
+@receiver(pre_delete, sender=Offer)
+def offer_deleting(sender, instance, origin=None, **kwargs):
+    if _deleted_model(origin) is Offer and Grade.objects.filter(message__offer=instance).exists():
+        # The offer's rollups are deleted with it, reputation and leaderboard are recounted after commit.
+        owner_ids = [instance.owner_id]
+        transaction.on_commit(lambda: rebuild_reputations(owner_ids))
+        invalidate_leaderboard()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    owner_ids = cascading_rating_owner_ids(instance)
+    if owner_ids:
+        def rebuild():
+            rebuild_reputations(owner_ids)
+            rebuild_rollups(owner_ids)
+
+        transaction.on_commit(rebuild)
+        invalidate_leaderboard()
+
+
+@receiver(pre_delete, sender=Grade)
+@receiver(pre_delete, sender=Answer)
+def rating_deleting(sender, instance, origin=None, **kwargs):
+    if _bulk_rating_delete(origin):
+        return
+    # Looked up before the delete: the message and offer may be deleted in the same cascade.
+    instance._rating_target = rating_target(_rating_kind(sender), instance)
+    if sender is Grade:
+        instance._leaderboard_scopes = grade_scopes(instance.message_id)
+
+
+@receiver(post_delete, sender=Grade)
+@receiver(post_delete, sender=Answer)
+def rating_deleted(sender, instance, origin=None, **kwargs):
+    if _bulk_rating_delete(origin):
+        return
+    kind = _rating_kind(sender)
+    value = getattr(instance, RATING_KINDS[kind][1])
+    owner_id, offer_id = getattr(instance, '_rating_target', (None, None))
+    record_rating(kind, owner_id, value, sign=-1)
+    record_rollup(kind, owner_id, offer_id, instance.created, value, sign=-1)
+    if kind == 'grade':
+        record_grade(getattr(instance, '_leaderboard_scopes', (None, None)), previous=instance.grade)
+
+
+@receiver(user_logged_in)
+def warm_unread_total(sender, user, **kwargs):
+    # Pages rendering the navbar badge then only read the cache.
+    get_unread_total(user.id)
@@ -0,0 +1,150 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from work_and_travel_app.models import Answer, Grade, Message, Reputation
+
+RATING_VALUES = range(1, 6)
+
+# kind -> (model, rating field, path to the credited user, path to the rated offer)
+RATING_KINDS = {
+    'grade': (Grade, 'grade', 'message__offer__owner_id', 'message__offer_id'),
+    'answer': (Answer, 'grade_answer', 'answer__message__offer__owner_id', 'answer__message__offer_id'),
+}
+
+REPUTATION_FIELDS = [
+    f'{kind}s_{total}' for kind in RATING_KINDS for total in ('count', 'sum')
+] + [f'{kind}_{value}' for kind in RATING_KINDS for value in RATING_VALUES]
+
+
+def rating_target(kind, rating):
+    """
+    (owner_id, offer_id) of the offer a grade or an answer was given on; the owner is the user the
+    rating counts towards.
+    """
+    if kind == 'grade':
+        target = Message.objects.filter(pk=rating.message_id).values_list('offer__owner_id', 'offer_id').first()
+    else:
+        target = Grade.objects.filter(pk=rating.answer_id).values_list(
+            'message__offer__owner_id', 'message__offer_id'
+        ).first()
+    return target or (None, None)
+
+
+def record_rating(kind, user_id, value, sign=1):
+    """Adds (sign=1) or removes (sign=-1) one rating of the given value to the user's reputation in SQL."""
+    if user_id is None or value not in RATING_VALUES:
+        return
+    changes = {
+        f'{kind}s_count': F(f'{kind}s_count') + sign,
+        f'{kind}s_sum': F(f'{kind}s_sum') + sign * value,
+        f'{kind}_{value}': F(f'{kind}_{value}') + sign,
+    }
+    with transaction.atomic():
+        if Reputation.objects.filter(user_id=user_id).update(**changes) or sign < 0:
+            return
+        try:
+            with transaction.atomic():
+                Reputation.objects.create(
+                    user_id=user_id, **{f'{kind}s_count': 1, f'{kind}s_sum': value, f'{kind}_{value}': 1}
+                )
+        except IntegrityError:
+            # Created concurrently by another rating.
+            Reputation.objects.filter(user_id=user_id).update(**changes)
+
+
+def live_reputations(user_ids=None):
+    """Reputations computed from the Grade and Answer tables, as unsaved instances by user id."""
+    reputations = {}
+    for kind, (model, field, owner, _) in RATING_KINDS.items():
+        ratings = model.objects.filter(**{f'{owner}__in': user_ids}) if user_ids is not None else model.objects
+        rows = ratings.values(owner_id=F(owner)).annotate(
+            count=Count('id'), total=Sum(field),
+            **{f'value_{value}': Count('id', filter=Q(**{field: value})) for value in RATING_VALUES},
+        ).order_by()
+        for row in rows:
+            reputation = reputations.setdefault(row['owner_id'], Reputation(user_id=row['owner_id']))
+            setattr(reputation, f'{kind}s_count', row['count'])
+            setattr(reputation, f'{kind}s_sum', row['total'])
+            for value in RATING_VALUES:
+                setattr(reputation, f'{kind}_{value}', row[f'value_{value}'])
+    return reputations
+
+
+def rebuild_reputations(user_ids=None):
+    reputations = live_reputations(user_ids)
+    stored = Reputation.objects.all() if user_ids is None else Reputation.objects.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        stored.delete()
+        Reputation.objects.bulk_create(reputations.values(), batch_size=1000)
+    return len(reputations)
+
+
+def cascading_rating_owner_ids(user):
+    """Owners credited by the ratings deleted along with the user: given by them, on their messages or offers."""
+    return set(Grade.objects.filter(
+        Q(user=user) | Q(message__sender=user) | Q(message__receiver=user) | Q(message__offer__owner=user)
+    ).values_list('message__offer__owner_id', flat=True).distinct())
+
+
+def check_reputations():
+    """Differences between stored and live reputations, as (user_id, field, stored, live) tuples."""
+    live = live_reputations()
+    stored = {reputation.user_id: reputation for reputation in Reputation.objects.all()}
+    differences = []
+    for user_id in sorted(live.keys() | stored.keys()):
+        expected, actual = live.get(user_id, Reputation()), stored.get(user_id, Reputation())
+        differences.extend(
+            (user_id, field, getattr(actual, field), getattr(expected, field))
+            for field in REPUTATION_FIELDS if getattr(actual, field) != getattr(expected, field)
+        )
+    return differences
+
+
+def rating_history(user):
+    """
+    Grades given on messages the user sent, with offer and owner joined in and the reply to each grade
+    (answer_value, answer_text) read by correlated subqueries, so any page is a single query.
+    """
+    answers = Answer.objects.filter(answer=OuterRef('pk')).order_by('-id')
+    return Grade.objects.filter(message__sender=user).select_related('message__offer__owner').annotate(
+        answer_value=Subquery(answers.values('grade_answer')[:1]),
+        answer_text=Subquery(answers.values('text')[:1]),
+    )
+
+
+def rating_history_entry(grade):
+    return {
+        'id': grade.id,
+        'offer_id': grade.message.offer_id,
+        'offer_names': grade.message.offer.name,
+        'owner_names': grade.message.offer.owner.username,
+        'grade_value': grade.grade,
+        'description': grade.description,
+        'answer_value': grade.answer_value,
+        'answer_text': grade.answer_text,
+    }
+
+
+def get_reputation(user):
+    return Reputation.objects.filter(user=user).first() or Reputation(user=user)
+
+
+def _average_expression(prefix, kind):
+    count, total = f'{prefix}{kind}s_count', f'{prefix}{kind}s_sum'
+    return Case(
+        When(**{f'{count}__gt': 0}, then=Cast(total, FloatField()) / F(count)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+
+
+def with_owner_rating(offers):
+    """
+    Annotates owner_rating (the profile average) and owner_rating_count from the owners' Reputation
+    rows, joined into the same query. Owners without ratings get 0, so the values can be sorted on.
+    """
+    prefix = 'owner__reputation__'
+    return offers.annotate(
+        owner_rating=(_average_expression(prefix, 'grade') + _average_expression(prefix, 'answer')) / 2,
+        owner_rating_count=Coalesce(F(f'{prefix}grades_count'), 0) + Coalesce(F(f'{prefix}answers_count'), 0),
+    )
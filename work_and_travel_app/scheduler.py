@@ -0,0 +1,50 @@
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(threading.Thread):
+    """
+    Runs a function every `interval` seconds in a daemon thread. The cache lock makes sure that only one
+    process sharing the cache runs the job per interval.
+    """
+
+    def __init__(self, name, func, interval):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run_once(self):
+        if not cache.add(f'scheduler:{self.name}:lock', True, self.interval):
+            return None
+        try:
+            return self.func()
+        except Exception:
+            logger.exception('Scheduled job %s failed', self.name)
+        finally:
+            close_old_connections()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.run_once()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_scheduler(settings):
+    jobs = []
+    if settings.OFFER_EXPIRY_INTERVAL:
+        from work_and_travel_app.expiry import deactivate_expired_offers
+
+        jobs.append(PeriodicJob('deactivate_expired_offers',
+                                lambda: deactivate_expired_offers(batch_size=settings.OFFER_EXPIRY_BATCH_SIZE),
+                                settings.OFFER_EXPIRY_INTERVAL))
+    for job in jobs:
+        job.start()
+    return jobs
@@ -0,0 +1,123 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Exists, F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from work_and_travel_app.models import Message, Offer
+
+SEARCH_CONFIG = 'simple'
+
+# Private-use characters mark the highlighted words, so the snippet can be HTML-escaped before they
+# are turned into <mark> tags.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+SNIPPET_CHARS = 200
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def offer_search_vector():
+    category_names = Offer.category.through.objects.filter(offer_id=OuterRef('pk')).values('offer_id').annotate(
+        names=StringAgg('category__name', ' ')
+    ).values('names')
+
+    return (
+        SearchVector('name', config=SEARCH_CONFIG, weight='A')
+        + SearchVector('country', 'city', config=SEARCH_CONFIG, weight='B')
+        + SearchVector(Coalesce(Subquery(category_names), Value('')), config=SEARCH_CONFIG, weight='B')
+        + SearchVector('description', config=SEARCH_CONFIG, weight='C')
+    )
+
+
+def update_search_vectors(offer_ids):
+    offers = Offer.objects.filter(pk__in=offer_ids)
+    if offer_ids and is_postgres(offers):
+        offers.update(search_vector=offer_search_vector())
+
+
+def prefix_query(terms):
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_offers(offers, text):
+    terms = search_terms(text)
+    if not terms:
+        return offers.annotate(search_rank=Value(0.0))
+
+    if is_postgres(offers):
+        query = prefix_query(terms)
+        # ts_rank() returns real; casting to double precision keeps the value exact for keyset cursors.
+        return offers.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        ).order_by('-search_rank', 'id')
+
+    for term in terms:
+        in_category = Offer.category.through.objects.filter(offer_id=OuterRef('pk'), category__name__icontains=term)
+        offers = offers.filter(
+            Q(name__icontains=term) | Q(country__icontains=term) | Q(city__icontains=term)
+            | Q(description__icontains=term) | Exists(in_category)
+        )
+    return offers.annotate(search_rank=Value(0.0)).order_by('id')
+
+
+def message_search_vector():
+    # Must stay in sync with the message_*_fts index expressions (migration 0026).
+    return SearchVector('message', config=SEARCH_CONFIG)
+
+
+def search_messages(user, text):
+    """
+    Messages sent or received by the user that contain all the words (as prefixes), best matches first.
+    On PostgreSQL each side of the OR is answered by a (user, tsvector) GIN index, so the user
+    restriction is part of the index scan; the highlighted snippet is annotated as `headline`.
+    """
+    messages = Message.objects.all()
+    terms = search_terms(text)
+    if not terms:
+        return messages.none()
+
+    if is_postgres(messages):
+        query = prefix_query(terms)
+        return messages.alias(document=message_search_vector()).filter(
+            Q(sender=user, document=query) | Q(receiver=user, document=query)
+        ).annotate(
+            search_rank=Cast(SearchRank(message_search_vector(), query), FloatField()),
+            headline=SearchHeadline(
+                'message', query, config=SEARCH_CONFIG, start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                max_words=30, min_words=10, max_fragments=2, fragment_delimiter=' … ',
+            ),
+        )
+
+    for term in terms:
+        messages = messages.filter(message__icontains=term)
+    return messages.filter(Q(sender=user) | Q(receiver=user)).annotate(search_rank=Value(0.0))
+
+
+def _highlight(text, terms):
+    words = re.compile(r'\b(?:%s)\w*' % '|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = words.search(text)
+    start = max(match.start() - SNIPPET_CHARS // 4, 0) if match else 0
+    fragment = text[start:start + SNIPPET_CHARS]
+    fragment = words.sub(lambda word: f'{HIGHLIGHT_START}{word.group()}{HIGHLIGHT_STOP}', fragment)
+    return ('… ' if start else '') + fragment + (' …' if start + SNIPPET_CHARS < len(text) else '')
+
+
+def message_snippet(message, text):
+    """HTML fragment of the message around the matched words, with the words wrapped in <mark>."""
+    headline = getattr(message, 'headline', None)
+    if headline is None:
+        headline = _highlight(message.message, search_terms(text))
+    return mark_safe(
+        escape(headline).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    )
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after offers were changed with queryset.update() / bulk operations, which bypass post_save.
+# Arguments: offer_ids
+offers_changed = Signal()
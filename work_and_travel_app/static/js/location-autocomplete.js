@@ -0,0 +1,33 @@
+(function () {
+    var input = document.querySelector('input[data-autocomplete-url]');
+    if (!input) {
+        return;
+    }
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var query = input.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (data.query.trim() !== input.value.trim()) {
+                        return;
+                    }
+                    list.innerHTML = '';
+                    data.results.forEach(function (result) {
+                        var option = document.createElement('option');
+                        option.value = result.city || result.country;
+                        option.label = result.label + ' (' + result.offers + ')';
+                        list.appendChild(option);
+                    });
+                });
+        }, 100);
+    });
+})();
@@ -0,0 +1,37 @@
+(function () {
+    var button = document.getElementById('older-messages');
+    if (!button) {
+        return;
+    }
+    var list = document.getElementById('topic-messages');
+
+    function item(message) {
+        var li = document.createElement('li');
+        li.appendChild(document.createTextNode('from: ' + message.sender));
+        li.appendChild(document.createElement('br'));
+        li.appendChild(document.createTextNode('message: ' + message.message));
+        li.appendChild(document.createElement('br'));
+        var time = document.createElement('small');
+        time.textContent = message.time.slice(0, 16).replace('T', ' ');
+        li.appendChild(time);
+        return li;
+    }
+
+    button.addEventListener('click', function () {
+        button.disabled = true;
+        fetch(button.dataset.url + '?after=' + encodeURIComponent(button.dataset.cursor))
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                var first = list.firstChild;
+                data.results.forEach(function (message) {
+                    list.insertBefore(item(message), first);
+                });
+                if (data.older) {
+                    button.dataset.cursor = data.older;
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            });
+    });
+})();
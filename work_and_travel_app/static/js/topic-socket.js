@@ -0,0 +1,73 @@
+(function () {
+    var list = document.getElementById('topic-messages');
+    if (!list || !list.dataset.socket) {
+        return;
+    }
+    var scheme = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    var shown = {};
+    var failures = 0;
+
+    function show(data) {
+        if (data.type !== 'message' || shown[data.id]) {
+            return;
+        }
+        shown[data.id] = true;
+        var li = document.createElement('li');
+        li.appendChild(document.createTextNode('from: ' + data.sender));
+        li.appendChild(document.createElement('br'));
+        li.appendChild(document.createTextNode('message: ' + data.message));
+        li.appendChild(document.createElement('br'));
+        var time = document.createElement('small');
+        time.textContent = data.time.slice(0, 16).replace('T', ' ');
+        li.appendChild(time);
+        list.appendChild(li);
+    }
+
+    // Long-poll fallback for networks that break WebSockets: every request waits server-side for new messages.
+    function poll(after) {
+        fetch(list.dataset.updates + (after ? '?after=' + encodeURIComponent(after) : ''))
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                data.results.forEach(show);
+                setTimeout(function () { poll(data.after); }, data.results.length ? 0 : 1000);
+            })
+            .catch(function () {
+                setTimeout(function () { poll(after); }, 5000);
+            });
+    }
+
+    function connect(delay) {
+        var opened = false;
+        var socket = new WebSocket(scheme + window.location.host + list.dataset.socket);
+        socket.onmessage = function (event) {
+            show(JSON.parse(event.data));
+        };
+        socket.onopen = function () {
+            opened = true;
+            failures = 0;
+            delay = 1000;
+        };
+        socket.onclose = function (event) {
+            if (event.code === 4403 || event.code === 4404) {
+                return;
+            }
+            failures = opened ? 0 : failures + 1;
+            if (failures >= 2) {
+                poll(list.dataset.latest);
+            } else {
+                setTimeout(function () { connect(Math.min(delay * 2, 30000)); }, delay);
+            }
+        };
+    }
+
+    if (window.WebSocket) {
+        connect(1000);
+    } else {
+        poll(list.dataset.latest);
+    }
+})();
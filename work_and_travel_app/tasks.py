@@ -0,0 +1,37 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.TASKS_WORKERS, thread_name_prefix='tasks')
+    return _executor
+
+
+def _run(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        close_old_connections()
+
+
+def run_async(func, *args, **kwargs):
+    """
+    Runs func in a background thread once the current transaction commits, so the request that
+    scheduled it does not wait for it and the task sees the committed rows.
+    """
+    if settings.TASKS_ALWAYS_EAGER:
+        transaction.on_commit(partial(func, *args, **kwargs))
+    else:
+        transaction.on_commit(partial(_get_executor().submit, _run, func, *args, **kwargs))
@@ -1,13 +1,47 @@
+import asyncio
+import json
 from datetime import date, timedelta
+from io import StringIO
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.db.models import Avg
 
 from django.urls import reverse
 from django.utils import timezone
 
-from work_and_travel_app.models import Offer, BaseInformation, Category, Message, Answer, Grade
+from work_and_travel.asgi import application
+from work_and_travel_app.caching import get_version
+from work_and_travel_app.conversations import get_unread_total
+from work_and_travel_app.expiry import deactivate_expired_offers
+from work_and_travel_app.geo import EARTH_RADIUS_KM, covering_cells, encode, haversine
+from work_and_travel_app.geocoding import clear_geocode_cache, geocode, geocode_offers, normalize
+from work_and_travel_app.leaderboard import Leaderboard, Ranking, get_leaderboard
+from work_and_travel_app.locations import similarity
+from work_and_travel_app.models import Offer, BaseInformation, Category, Message, Answer, Grade, GeocodedLocation, \
+    Conversation, ArchivedConversation, Reputation, RatingRollup
+from work_and_travel_app.ratelimit import parse_rate, rate_limit_key, take_token
+from work_and_travel_app.reputation import check_reputations
+from work_and_travel_app.scheduler import PeriodicJob
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    clear_geocode_cache()
+    yield
+    cache.clear()
+    clear_geocode_cache()
 
 
 @pytest.fixture
@@ -778,6 +812,107 @@ def test_offers_list_pagination(client, create_offers):
     assert len(offers_list.object_list) <= 2
 
 
+@pytest.fixture
+def many_offers(db, users, create_offers):
+    offers = [
+        Offer.objects.create(
+            name=f'Seasonal Job {i}',
+            country='Spain',
+            city='Madrid',
+            description='Seasonal work.',
+            offer_type='job offer',
+            since_when=date(2023, 5, 1) + timedelta(days=i % 3),
+            until_when=date(2024, 5, 1),
+            owner=users[i % 3],
+        )
+        for i in range(5)
+    ]
+    return list(Offer.objects.filter(is_active=True).order_by('since_when', 'id'))
+
+
+# paginacja kursorem - przejście do przodu i do tyłu po wszystkich ofertach
+@pytest.mark.django_db
+def test_offers_list_keyset_pagination(client, many_offers):
+    seen = []
+    params = {'page_size': 2}
+    while True:
+        response = client.get(reverse('offers_list'), params)
+        offers_list = response.context['offers_list']
+        assert response.context['keyset']
+        seen.extend(offers_list.object_list)
+        if not offers_list.has_next():
+            break
+        params = {'page_size': 2, 'after': offers_list.next_cursor}
+    assert seen == many_offers
+
+    backwards = []
+    while offers_list.has_previous():
+        response = client.get(reverse('offers_list'), {'page_size': 2, 'before': offers_list.previous_cursor})
+        offers_list = response.context['offers_list']
+        backwards = list(offers_list.object_list) + backwards
+    assert backwards == many_offers[:len(backwards)]
+    assert backwards[0] == many_offers[0]
+
+
+# paginacja kursorem nie liczy wszystkich ofert
+@pytest.mark.django_db
+def test_offers_list_keyset_without_count(client, many_offers):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('offers_list'))
+    assert 'Seasonal Job' in response.content.decode() or 'Software Developer' in response.content.decode()
+    assert not any('COUNT(*)' in query['sql'] for query in queries.captured_queries)
+    assert 'after=' in response.content.decode()
+
+
+# stare linki ?page= nadal działają dla pierwszych stron
+@pytest.mark.django_db
+def test_offers_list_page_links_still_work(client, many_offers):
+    response = client.get(reverse('offers_list'), {'page': 2, 'page_size': 3})
+    offers_list = response.context['offers_list']
+    assert not response.context['keyset']
+    assert offers_list.number == 2
+    assert list(offers_list.object_list) == many_offers[3:6]
+
+
+# "next" z ostatniej numerowanej strony przechodzi na kursor
+@pytest.mark.django_db
+def test_offers_list_next_after_last_offset_page(client, users, many_offers):
+    for i in range(5):
+        Offer.objects.create(name=f'Late Job {i}', country='Spain', city='Madrid', description='Late work.',
+                             offer_type='job offer', since_when=date(2023, 6, 1), until_when=date(2024, 5, 1),
+                             owner=users[0])
+    offers = list(Offer.objects.filter(is_active=True).order_by('since_when', 'id'))
+    response = client.get(reverse('offers_list'), {'page': 10, 'page_size': 1})
+    assert list(response.context['offers_list']) == offers[9:10]
+    next_link = re.search(r'href="\?([^"]*)">next', response.content.decode())[1].replace('&amp;', '&')
+    assert 'page=' not in next_link
+
+    response = client.get(reverse('offers_list') + '?' + next_link)
+    assert response.context['keyset']
+    assert list(response.context['offers_list']) == offers[10:11]
+
+
+# zepsuty kursor - pierwsza strona
+@pytest.mark.django_db
+@pytest.mark.parametrize("cursor", ['not-a-cursor', 'WyJ4Il0', 'WyJ4IiwxXQ', 'WyIyMDIwLTAxLTAxIiwieSJd'])
+def test_offers_list_invalid_cursor(client, many_offers, cursor):
+    response = client.get(reverse('offers_list'), {'after': cursor, 'page_size': 2})
+    assert list(response.context['offers_list'].object_list) == many_offers[:2]
+
+
+# kursor z wartościami złego typu - pierwsza strona zamiast błędu 500
+@pytest.mark.django_db
+def test_invalid_cursor_value_types(client, users, many_offers, grade):
+    response = client.get(reverse('offers_list'), {'sort': 'rating', 'after': 'WyJhYmMiLDFd'})
+    assert response.status_code == 200
+    assert len(response.context['offers_list']) == 2
+
+    client.force_login(users[2])
+    response = client.get(reverse('your_grades'), {'after': 'WyJ4Il0'})
+    assert response.status_code == 200
+    assert [entry['id'] for entry in response.context['grades_list']] == [grade.id]
+
+
 # różne wielkosci liter
 @pytest.mark.django_db
 @pytest.mark.parametrize("search_query,expected_count,expected_countries", [
@@ -795,6 +930,563 @@ def test_offers_list_view_search(client, create_offers, search_query, expected_c
         assert offer.country == expected_country
 
 
+# wyszukiwanie pełnotekstowe po nazwie, mieście, opisie i kategorii
+@pytest.mark.django_db
+@pytest.mark.parametrize("search_query,expected_names", [
+    ('developer', ['Software Developer']),
+    ('Toronto', ['Digital Marketer']),
+    ('marketing', ['Digital Marketer']),
+    ('techno', ['Software Developer']),
+    ('warsaw developer', ['Software Developer']),
+    ('developer marketing', []),
+    ('designer', []),
+])
+def test_offers_list_full_text_search(client, create_offers, search_query, expected_names):
+    response = client.get(reverse('offers_list'), {'search': search_query})
+    offers = response.context['offers_list'].object_list
+    assert [offer.name for offer in offers] == expected_names
+
+
+# czy tekst wyszukiwania jest poprawnie kodowany w przekierowaniu
+@pytest.mark.django_db
+def test_start_search_redirect_encoding(client, create_offers):
+    response = client.get(reverse('start'), {'search': 'Poland & more'})
+    assert response.url == reverse('offers_list') + '?search=Poland+%26+more'
+
+
+# podobieństwo trigramów liczone tak jak w pg_trgm
+@pytest.mark.parametrize("first,second,is_similar", [
+    ('Polnd', 'Poland', True),
+    ('Warszawa', 'Warsaw', True),
+    ('warsaw ', 'Warsaw', True),
+    ('Germany', 'Canada', False),
+])
+def test_location_similarity(first, second, is_similar):
+    assert (similarity(first, second) >= 0.3) == is_similar
+    assert similarity(second, second) == 1.0
+
+
+# literówki w lokalizacji - wyniki z podobnych lokalizacji
+@pytest.mark.django_db
+@pytest.mark.parametrize("search_query,expected_names", [
+    ('Polnd', ['Software Developer']),
+    ('Warszawa', ['Software Developer']),
+    ('Torontoo', ['Digital Marketer']),
+])
+def test_offers_list_fuzzy_location(client, create_offers, search_query, expected_names):
+    response = client.get(reverse('offers_list'), {'search': search_query})
+    offers = response.context['offers_list'].object_list
+    assert [offer.name for offer in offers] == expected_names
+    assert response.context['similar_locations']
+    assert 'showing offers in similar locations' in response.content.decode()
+
+
+# brak dopasowań również wśród podobnych lokalizacji - bez komunikatu o podobnych
+@pytest.mark.django_db
+def test_offers_list_no_similar_locations(client, create_offers):
+    response = client.get(reverse('offers_list'), {'search': 'Qwxzvbnm'})
+    assert list(response.context['offers_list']) == []
+    assert not response.context['similar_locations']
+    assert 'showing offers in similar locations' not in response.content.decode()
+
+
+# endpoint do podpowiedzi lokalizacji
+@pytest.mark.django_db
+def test_location_lookup(client, create_offers):
+    response = client.get(reverse('location_lookup'), {'q': 'Polnd'})
+    results = response.json()['results']
+    assert results[0]['country'] == 'Poland'
+    assert results[0]['city'] == 'Warsaw'
+    assert results[0]['offers'] == 1
+    assert results[0]['similarity'] > 0.3
+
+
+# nieaktywne oferty i pusty tekst nie dają wyników
+@pytest.mark.django_db
+@pytest.mark.parametrize("query", ['Londn', '', '   '])
+def test_location_lookup_empty(client, create_offers, query):
+    response = client.get(reverse('location_lookup'), {'q': query})
+    assert response.json()['results'] == []
+
+
+# benchmark porównujący icontains z wyszukiwaniem rozmytym
+@pytest.mark.django_db
+def test_benchmark_location_search_command(create_offers):
+    out = StringIO()
+    call_command('benchmark_location_search', 'Polnd', offers=20, repeat=1, stdout=out)
+    output = out.getvalue()
+    assert 'icontains' in output
+    assert 'fuzzy' in output
+    assert Offer.objects.count() == 3
+
+
+# ocena właściciela na liście i w szczegółach oferty
+@pytest.mark.django_db
+def test_offers_list_owner_rating(client, users, create_offers, grade, answer):
+    Offer.objects.filter(pk=create_offers[2].pk).update(is_active=True)
+    response = client.get(reverse('offers_list'), {'page_size': 10})
+    ratings = {offer.id: (offer.owner_rating, offer.owner_rating_count) for offer in response.context['offers_list']}
+    assert ratings[create_offers[2].id] == (4.5, 2)
+    assert ratings[create_offers[0].id] == (0, 0)
+    assert '4.50 (2 ratings)' in response.content.decode()
+
+    response = client.get(reverse('offer_details', kwargs={'offer_id': create_offers[2].id}))
+    assert '4.50 (2 ratings)' in response.content.decode()
+
+
+# sortowanie od najlepiej ocenianych właścicieli, stronicowane kursorem
+@pytest.mark.django_db
+def test_offers_list_sort_by_rating(client, users, many_offers, grade, answer):
+    Reputation.objects.create(user=users[0], grades_count=1, grades_sum=3, grade_3=1)
+    seen = []
+    params = {'sort': 'rating', 'page_size': 2}
+    while True:
+        response = client.get(reverse('offers_list'), params)
+        seen.extend(response.context['offers_list'])
+        if not response.context['offers_list'].has_next():
+            break
+        params['after'] = response.context['offers_list'].next_cursor
+    assert len(seen) == len(many_offers)
+    assert [offer.owner_rating for offer in seen] == sorted((offer.owner_rating for offer in seen), reverse=True)
+    assert seen[0].owner == users[2]
+
+
+"""testy facetów w liście ofert"""
+
+
+def facet_counts(response, facet):
+    return {option['label']: option['count'] for option in response.context['facets'][facet]}
+
+
+# liczniki facetów bez filtrów
+@pytest.mark.django_db
+def test_offers_list_facets(client, many_offers):
+    response = client.get(reverse('offers_list'))
+    assert response.context['offers_count'] == 7
+    assert facet_counts(response, 'country') == {'Canada': 1, 'Poland': 1, 'Spain': 5}
+    assert facet_counts(response, 'category') == {'Marketing': 1, 'Technology': 1}
+    assert facet_counts(response, 'offer_type') == {'Job Offer': 7}
+    assert facet_counts(response, 'only_for_women') == {'Only for women': 1, 'Everyone': 6}
+
+
+# filtrowanie po facetach, liczniki pozostałych wartości tego samego facetu zostają
+@pytest.mark.django_db
+@pytest.mark.parametrize("params,expected_count,expected_countries", [
+    ({'country': 'Spain'}, 5, {'Canada': 1, 'Poland': 1, 'Spain': 5}),
+    ({'only_for_women': '1'}, 1, {'Canada': 1}),
+    ({'offer_type': 'job seekers'}, 0, {}),
+    ({'country': 'Spain', 'only_for_women': '0'}, 5, {'Poland': 1, 'Spain': 5}),
+])
+def test_offers_list_facet_filters(client, many_offers, params, expected_count, expected_countries):
+    response = client.get(reverse('offers_list'), dict(params, page_size=10))
+    assert response.context['offers_count'] == expected_count
+    assert len(response.context['offers_list']) == expected_count
+    assert facet_counts(response, 'country') == expected_countries
+
+
+# filtr kategorii
+@pytest.mark.django_db
+def test_offers_list_category_facet(client, many_offers, create_categories):
+    response = client.get(reverse('offers_list'), {'category': create_categories[0].id})
+    assert [offer.name for offer in response.context['offers_list']] == ['Software Developer']
+    assert facet_counts(response, 'country') == {'Poland': 1}
+    assert facet_counts(response, 'category') == {'Marketing': 1, 'Technology': 1}
+    selected = [option for option in response.context['facets']['category'] if option['selected']]
+    assert [option['label'] for option in selected] == ['Technology']
+
+
+# facety liczone jednym zapytaniem i trzymane w cache do zmiany ofert
+@pytest.mark.django_db
+def test_offers_list_facets_cached(client, users, many_offers, django_assert_num_queries,
+                                   django_capture_on_commit_callbacks):
+    client.get(reverse('offers_list'))
+    with django_assert_num_queries(2):  # tylko oferty + kategorie
+        client.get(reverse('offers_list'), {'country': 'Spain'})
+
+    version = get_version('facets')
+    with django_capture_on_commit_callbacks(execute=True):
+        Offer.objects.create(
+            name='New Job', country='Spain', city='Seville', description='New.', offer_type='job seekers',
+            since_when=date(2024, 1, 1), until_when=date(2024, 2, 1), owner=users[0],
+        )
+        # wersja facetów zmienia się dopiero po zatwierdzeniu transakcji
+        assert get_version('facets') == version
+    assert get_version('facets') != version
+    response = client.get(reverse('offers_list'))
+    assert facet_counts(response, 'country')['Spain'] == 6
+    assert facet_counts(response, 'offer_type') == {'Job Offer': 7, 'Job Seekers': 1}
+
+
+"""testy wyszukiwania ofert w pobliżu"""
+
+
+@pytest.fixture
+def located_offers(create_offers, users):
+    points = [
+        ('Warsaw', 52.2297, 21.0122),
+        ('Piaseczno', 52.0812, 21.0238),
+        ('Krakow', 50.0647, 19.9450),
+    ]
+    offers = []
+    for city, latitude, longitude in points:
+        offers.append(Offer.objects.create(
+            name=f'Job in {city}', country='Poland', city=city, description='Nearby work.',
+            offer_type='job offer', since_when=date(2024, 5, 1), until_when=date(2024, 6, 1),
+            owner=users[0], latitude=latitude, longitude=longitude,
+        ))
+    return offers
+
+
+# geohash zgodny z referencyjną implementacją
+def test_geohash_encode():
+    assert encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert encode(-25.382708, -49.265506, 5) == '6gkzw'
+
+
+# komórki pokrywają każdy punkt w promieniu
+@pytest.mark.parametrize("latitude,longitude,radius", [(52.2297, 21.0122, 20), (0.01, 0.01, 5), (64.1, -21.9, 150)])
+def test_covering_cells_cover_radius(latitude, longitude, radius):
+    cells = covering_cells(latitude, longitude, radius)
+    assert 0 < len(cells) <= 16
+    for step in range(36):
+        bearing = math.radians(step * 10)
+        d = radius / EARTH_RADIUS_KM * 0.999
+        lat = math.asin(math.sin(math.radians(latitude)) * math.cos(d)
+                        + math.cos(math.radians(latitude)) * math.sin(d) * math.cos(bearing))
+        lon = math.radians(longitude) + math.atan2(
+            math.sin(bearing) * math.sin(d) * math.cos(math.radians(latitude)),
+            math.cos(d) - math.sin(math.radians(latitude)) * math.sin(lat))
+        point_hash = encode(math.degrees(lat), math.degrees(lon))
+        assert any(point_hash.startswith(cell) for cell in cells)
+
+
+# geohash wyliczany przy zapisie oferty
+@pytest.mark.django_db
+def test_offer_geohash_saved(located_offers):
+    offer = located_offers[0]
+    assert offer.geohash == encode(52.2297, 21.0122)
+    offer.latitude = None
+    offer.save()
+    offer.refresh_from_db()
+    assert offer.geohash == ''
+
+
+# oferty w promieniu posortowane po odległości
+@pytest.mark.django_db
+def test_nearby_offers_sorted_by_distance(client, located_offers):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('nearby_offers'), {'lat': 52.2297, 'lon': 21.0122, 'radius': 20})
+    assert response.status_code == 200
+    assert len(queries) == 1
+    results = response.json()['results']
+    assert [result['city'] for result in results] == ['Warsaw', 'Piaseczno']
+    assert results[0]['distance'] == 0
+    assert results[1]['distance'] == pytest.approx(haversine(52.2297, 21.0122, 52.0812, 21.0238), abs=0.001)
+
+
+# kolejna strona z kursora, nieaktywne oferty pominięte
+@pytest.mark.django_db
+def test_nearby_offers_pagination(client, located_offers):
+    located_offers[1].is_active = False
+    located_offers[1].save()
+    params = {'lat': 52.0, 'lon': 21.0, 'radius': 300, 'page_size': 1}
+    first = client.get(reverse('nearby_offers'), params).json()
+    assert [result['city'] for result in first['results']] == ['Warsaw']
+    second = client.get(reverse('nearby_offers'), dict(params, after=first['next'])).json()
+    assert [result['city'] for result in second['results']] == ['Krakow']
+    assert second['next'] is None
+    previous = client.get(reverse('nearby_offers'), dict(params, before=second['previous'])).json()
+    assert previous['results'] == first['results']
+
+
+# błędne parametry
+@pytest.mark.django_db
+@pytest.mark.parametrize("params", [{}, {'lat': 'x', 'lon': 21}, {'lat': 95, 'lon': 21}, {'lat': 52, 'lon': 21, 'radius': 0}])
+def test_nearby_offers_bad_params(client, params):
+    response = client.get(reverse('nearby_offers'), params)
+    assert response.status_code == 400
+
+
+"""testy geokodowania lokalizacji ofert"""
+
+
+# normalizacja nazw miejscowości
+@pytest.mark.parametrize("name,expected", [('  Kraków ', 'krakow'), ('Łódź', 'lodz'), ('New-York  City', 'new york city')])
+def test_normalize_location_name(name, expected):
+    assert normalize(name) == expected
+
+
+# wynik z gazetera zapisany w tabeli i w pamięci podręcznej
+@pytest.mark.django_db
+def test_geocode_memoized(django_assert_num_queries):
+    assert geocode('Polska', 'Warszawa') == (52.2297, 21.0122)
+    assert geocode('Atlantis', 'Poseidonia') is None
+    assert GeocodedLocation.objects.filter(country_key='atlantis', latitude__isnull=True).exists()
+    with django_assert_num_queries(0):
+        assert geocode('POLSKA', ' warszawa ') == (52.2297, 21.0122)
+        assert geocode('Atlantis', 'Poseidonia') is None
+
+
+# uzupełnianie współrzędnych istniejących ofert komendą
+@pytest.mark.django_db
+def test_geocode_offers_command(create_offers):
+    create_offers[1].latitude, create_offers[1].longitude = 1.0, 2.0
+    create_offers[1].save()
+    out = StringIO()
+    call_command('geocode_offers', chunk_size=1, stdout=out)
+    assert out.getvalue().strip() == 'Geocoded 2 of 2 offers.'
+    warsaw, toronto, london = Offer.objects.order_by('id')
+    assert (warsaw.latitude, warsaw.longitude) == (52.2297, 21.0122)
+    assert warsaw.geohash == encode(52.2297, 21.0122)
+    assert (toronto.latitude, toronto.longitude) == (1.0, 2.0)
+    assert (london.latitude, london.longitude) == (51.5074, -0.1278)
+
+
+# nowa oferta geokodowana po zatwierdzeniu transakcji
+@pytest.mark.django_db
+def test_add_offer_geocoded_on_commit(client, users, create_categories, settings, django_capture_on_commit_callbacks):
+    settings.TASKS_ALWAYS_EAGER = True
+    client.force_login(users[0])
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        client.post(reverse('add_offer'), {
+            'name': 'Barista', 'country': 'Spain', 'city': 'Sevilla', 'description': 'Coffee.',
+            'offer_type': 'job offer', 'category': [create_categories[0].id],
+            'since_when': timezone.now().date() + timedelta(days=1),
+            'until_when': timezone.now().date() + timedelta(days=2),
+        })
+    # geokodowanie w tle, obok aktualizacji indeksu lokalizacji
+    assert [callback.func for callback in callbacks].count(geocode_offers) == 1
+    offer = Offer.objects.get(name='Barista')
+    assert (offer.latitude, offer.longitude) == (37.3891, -5.9845)
+
+
+# zmiana miasta przy edycji przelicza współrzędne
+@pytest.mark.django_db
+def test_edit_offer_regeocoded(client, users, create_categories, settings, django_capture_on_commit_callbacks):
+    settings.TASKS_ALWAYS_EAGER = True
+    client.force_login(users[0])
+    offer = Offer.objects.create(
+        name='Guide', country='Poland', city='Warsaw', description='Tours.', offer_type='job offer',
+        since_when=timezone.now().date() + timedelta(days=1), until_when=timezone.now().date() + timedelta(days=2),
+        owner=users[0], latitude=52.2297, longitude=21.0122,
+    )
+    data = {
+        'name': 'Guide', 'country': 'Poland', 'city': 'Kraków', 'description': 'Tours.', 'offer_type': 'job offer',
+        'category': [create_categories[0].id], 'since_when': offer.since_when, 'until_when': offer.until_when,
+        'latitude': 52.2297, 'longitude': 21.0122, 'is_active': True,
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse('edit_offer', kwargs={'offer_id': offer.id}), data)
+    offer.refresh_from_db()
+    assert (offer.latitude, offer.longitude) == (50.0647, 19.9450)
+
+
+"""testy podpowiedzi lokalizacji"""
+
+
+def autocomplete(client, query):
+    return client.get(reverse('location_autocomplete'), {'q': query}).json()['results']
+
+
+# podpowiedzi krajów i miast aktywnych ofert
+@pytest.mark.django_db
+def test_location_autocomplete(client, many_offers):
+    assert autocomplete(client, 'sp') == [
+        {'type': 'country', 'label': 'Spain', 'country': 'Spain', 'city': None, 'offers': 5},
+    ]
+    assert [result['label'] for result in autocomplete(client, 'WAR')] == ['Warsaw, Poland']
+    assert autocomplete(client, 'lon') == []
+    assert autocomplete(client, '') == []
+
+
+# kolejne zapytania nie trafiają do bazy
+@pytest.mark.django_db
+def test_location_autocomplete_no_queries(client, create_offers, django_assert_num_queries):
+    autocomplete(client, 'p')
+    with django_assert_num_queries(0):
+        assert [result['label'] for result in autocomplete(client, 'pol')] == ['Poland']
+        assert [result['offers'] for result in autocomplete(client, 'w')] == [1]
+
+
+# indeks aktualizowany przy zapisie i dezaktywacji oferty
+@pytest.mark.django_db
+def test_location_autocomplete_incremental(client, create_offers, users, django_assert_num_queries,
+                                          django_capture_on_commit_callbacks):
+    autocomplete(client, 'p')
+    with django_capture_on_commit_callbacks(execute=True):
+        offer = Offer.objects.create(
+            name='Taxi driver', country='United States', city='New York', description='Driving.',
+            offer_type='job offer', since_when=date(2024, 5, 1), until_when=date(2024, 6, 1), owner=users[0],
+        )
+    with django_assert_num_queries(0):
+        assert [result['label'] for result in autocomplete(client, 'york')] == ['New York, United States']
+    with django_capture_on_commit_callbacks(execute=True):
+        offer.is_active = False
+        offer.save()
+    with django_assert_num_queries(0):
+        assert autocomplete(client, 'york') == []
+        assert autocomplete(client, 'united') == []
+
+
+# indeks zmienia się dopiero po zatwierdzeniu transakcji
+@pytest.mark.django_db
+def test_location_autocomplete_waits_for_commit(client, create_offers, users, django_capture_on_commit_callbacks):
+    autocomplete(client, 'p')
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        Offer.objects.create(
+            name='Taxi driver', country='United States', city='New York', description='Driving.',
+            offer_type='job offer', since_when=date(2024, 5, 1), until_when=date(2024, 6, 1), owner=users[0],
+        )
+        create_offers[0].delete()
+    assert autocomplete(client, 'york') == []
+    assert [result['label'] for result in autocomplete(client, 'war')] == ['Warsaw, Poland']
+
+
+# masowa dezaktywacja przebudowuje indeks
+@pytest.mark.django_db
+def test_location_autocomplete_after_expiry(client, create_offers, django_capture_on_commit_callbacks):
+    assert autocomplete(client, 'tor') != []
+    with django_capture_on_commit_callbacks(execute=True):
+        deactivate_expired_offers(today=date(2030, 1, 1))
+    assert autocomplete(client, 'tor') == []
+
+
+"""testy dostępności ofert w zakresie dat"""
+
+
+# oferty dostępne w podanym oknie dat, z tolerancją ±N dni
+@pytest.mark.django_db
+@pytest.mark.parametrize("params,expected", [
+    ({'available_from': '2023-06-01', 'available_until': '2023-07-01'}, ['Software Developer']),
+    ({'available_from': '2024-03-01'}, ['Software Developer', 'Digital Marketer']),
+    ({'available_from': '2024-05-10', 'available_until': '2024-05-20'}, []),
+    ({'available_from': '2024-05-10', 'available_until': '2024-05-20', 'flex': 10},
+     ['Software Developer', 'Digital Marketer']),
+    ({'available_from': 'wrong'}, ['Software Developer', 'Digital Marketer']),
+])
+def test_offers_list_availability(client, create_offers, params, expected):
+    response = client.get(reverse('offers_list'), dict(params, page_size=10))
+    assert [offer.name for offer in response.context['offers_list']] == expected
+    assert response.context['offers_count'] == len(expected)
+
+
+# kalendarz miesiąca liczony jednym zapytaniem
+@pytest.mark.django_db
+def test_availability_calendar(client, create_offers, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        response = client.get(reverse('availability_calendar'), {'month': '2024-02'})
+    days = response.json()['days']
+    assert len(days) == 29
+    assert days[0] == {'date': '2024-02-01', 'offers': 1}
+    assert days[-1] == {'date': '2024-02-29', 'offers': 2}
+    assert response.json()['month'] == '2024-02'
+
+
+# błędny miesiąc
+@pytest.mark.django_db
+@pytest.mark.parametrize("month", ['2024-13', 'luty', '2024-02-01'])
+def test_availability_calendar_bad_month(client, month):
+    response = client.get(reverse('availability_calendar'), {'month': month})
+    assert response.status_code == 400
+
+
+"""testy wygaszania nieaktualnych ofert"""
+
+
+# wygaszanie partiami i raport liczby zmienionych ofert
+@pytest.mark.django_db
+def test_deactivate_expired_offers_command(client, many_offers, django_assert_num_queries,
+                                           django_capture_on_commit_callbacks):
+    response = client.get(reverse('offers_list'))
+    assert response.context['offers_count'] == 7
+
+    out = StringIO()
+    with django_capture_on_commit_callbacks(execute=True), django_assert_num_queries(8):
+        # 4 partie po 2: select + update, ostatnia niepełna kończy pętlę
+        call_command('deactivate_expired_offers', '--batch-size=2', '--date=2024-05-02', stdout=out)
+    assert 'Deactivated 7 expired offers.' in out.getvalue()
+    assert not Offer.objects.filter(is_active=True).exists()
+
+    response = client.get(reverse('offers_list'))
+    assert response.context['offers_count'] == 0
+    assert list(response.context['offers_list']) == []
+
+
+# oferty jeszcze aktualne zostają aktywne
+@pytest.mark.django_db
+def test_deactivate_expired_offers_keeps_current(create_offers):
+    expired = Offer.objects.create(
+        name='Old offer', country='Poland', city='Gdansk', description='Old.', offer_type='job offer',
+        since_when=date(2024, 1, 1), until_when=date(2024, 3, 31), owner=create_offers[0].owner,
+    )
+    assert deactivate_expired_offers(today=date(2024, 4, 1)) == 1
+    assert not Offer.objects.get(id=expired.id).is_active
+    assert Offer.objects.filter(is_active=True).count() == 2
+
+
+# zadanie okresowe uruchamia się raz na interwał
+@pytest.mark.django_db
+def test_periodic_job_runs_once_per_interval():
+    calls = []
+    job = PeriodicJob('test_job', lambda: calls.append(1) or len(calls), interval=60)
+    assert job.run_once() == 1
+    assert job.run_once() is None
+    assert calls == [1]
+
+
+"""testy liczby zapytań - bez N+1"""
+
+
+# lista ofert - stała liczba zapytań niezależnie od rozmiaru strony
+@pytest.mark.django_db
+@pytest.mark.parametrize("page_size", [1, 3, 7])
+@pytest.mark.parametrize("params,logged,expected_queries", [
+    ({}, False, 4),  # lista kategorii i agregat facetów (cache) + oferty + kategorie
+    ({}, True, 6),  # sesja + użytkownik + lista kategorii + agregat facetów + oferty + kategorie
+    ({'page': 1}, False, 5),  # lista kategorii + agregat facetów + count + oferty + kategorie
+    ({'search': 'Spain'}, False, 5),  # exists + lista kategorii + agregat facetów + oferty + kategorie
+    ({'sort': 'rating'}, False, 4),  # ocena właściciela w tym samym zapytaniu co oferty
+])
+def test_offers_list_query_count(client, users, many_offers, django_assert_num_queries, page_size, params, logged,
+                                 expected_queries):
+    if logged:
+        client.force_login(users[0])
+    with django_assert_num_queries(expected_queries):
+        response = client.get(reverse('offers_list'), dict(params, page_size=page_size))
+    assert len(response.context['offers_list']) == min(page_size, len(response.context['offers']))
+
+
+# twoje oferty - stała liczba zapytań
+@pytest.mark.django_db
+@pytest.mark.parametrize("offers_count", [0, 1, 5])
+def test_your_offers_query_count(client, users, create_categories, django_assert_num_queries, offers_count):
+    for i in range(offers_count):
+        offer = Offer.objects.create(
+            name=f'Offer {i}', country='Poland', city='Warsaw', description='Description', offer_type='job offer',
+            since_when=date(2024, 1, 1), until_when=date(2024, 2, 1), owner=users[0],
+        )
+        offer.category.set(create_categories)
+    client.force_login(users[0])
+    with django_assert_num_queries(4 if offers_count else 3):  # sesja + użytkownik + oferty (+ kategorie)
+        response = client.get(reverse('your_offers'))
+    assert len(response.context['offers']) == offers_count
+
+
+# szczegóły oferty - stała liczba zapytań
+@pytest.mark.django_db
+@pytest.mark.parametrize("logged,expected_queries", [(False, 2), (True, 4)])
+def test_offer_details_query_count(client, users, create_offers, create_categories, django_assert_num_queries,
+                                   logged, expected_queries):
+    offer = create_offers[0]
+    offer.category.set(create_categories)
+    if logged:
+        client.force_login(users[1])
+    with django_assert_num_queries(expected_queries):
+        response = client.get(reverse('offer_details', kwargs={'offer_id': offer.id}))
+    for category in create_categories:
+        assert category.name in response.content.decode()
+
+
 """testy do widoku YourOffersView"""
 
 
@@ -898,32 +1590,48 @@ def test_message_box_view_logged(client, users, create_offers, messages):
     assert response.status_code == 200
     assert 'conversations' in response.context
     conversations = response.context['conversations']
-    for offer, msgs in conversations.items():
-        assert any(message.sender == users[0] or message.receiver == users[0] for message in msgs)
+    assert [conversation['offer'] for conversation in conversations] == [create_offers[2], create_offers[0]]
+    for conversation in conversations:
+        message = conversation['last_message']
+        assert message.sender == users[0] or message.receiver == users[0]
 
 
-# kolejnosc wiadomosci
+# kolejnosc konwersacji - najnowsza na gorze
 @pytest.mark.django_db
 def test_message_box_order(client, users, create_offers, messages):
+    Message.objects.create(message='Any news?', sender=users[1], receiver=users[0], offer=create_offers[0])
     client.force_login(users[0])
     response = client.get(reverse('message_box'))
     conversations = response.context['conversations']
-    for offer, msgs in conversations.items():
-        sorted_messages = sorted(msgs, key=lambda message: message.time)
-        assert list(msgs) == sorted_messages
+    times = [conversation['last_message'].time for conversation in conversations]
+    assert times == sorted(times, reverse=True)
+    assert conversations[0]['last_message'].message == 'Any news?'
 
 
-# poprawnosc nadawcy i odbiorcy
+# poprawnosc rozmowcy i nieprzeczytanych
 @pytest.mark.django_db
 def test_message_box_view_sender_receiver(client, users, create_offers, messages):
     client.force_login(users[0])
 
     response = client.get(reverse('message_box'))  # pobieram konwersacje
-    conversations = response.context['conversations']
+    conversations = {conversation['offer']: conversation for conversation in response.context['conversations']}
 
-    for offer, conversation_messages in conversations.items():
-        for message in conversation_messages:  # ide przez konwersaje
-            assert message.sender == users[0] or message.receiver == users[0]
+    assert conversations[create_offers[0]]['partner'] == users[1]
+    assert conversations[create_offers[0]]['unread'] == 0
+    assert conversations[create_offers[2]]['partner'] == users[2]
+    assert conversations[create_offers[2]]['unread'] == 1
+
+
+# skrzynka jednym zapytaniem niezaleznie od historii
+@pytest.mark.django_db
+def test_message_box_single_query(client, users, create_offers, messages, django_assert_num_queries):
+    for i in range(20):
+        Message.objects.create(message=f'Message {i}', sender=users[1], receiver=users[0], offer=create_offers[0])
+    client.force_login(users[0])
+    with django_assert_num_queries(3):
+        response = client.get(reverse('message_box'))
+    assert len(response.context['conversations']) == 2
+    assert response.context['conversations'][0]['unread'] == 20
 
 
 # nie zalogowany
@@ -951,34 +1659,51 @@ def test_messages_view_for_logged_user(client, users, create_offers, messages):
     response = client.get(reverse('messages_view', kwargs={'offer_id': offer.id}))
     assert 'conversations' in response.context
     conversations = response.context['conversations']
+    assert len(conversations) == 1
     for conversation in conversations:
-        assert any(message.sender == users[0] or message.receiver == users[0] for message in conversation['messages'])
+        message = conversation['last_message']
+        assert message.sender == users[0] or message.receiver == users[0]
 
 
-# kolejnosc wiadomosci
+# kolejnosc konwersacji
 @pytest.mark.django_db
 def test_messages_order_in_conversation(client, users, create_offers, messages):
+    Message.objects.create(message='Hello', sender=users[2], receiver=users[0], offer=create_offers[0])
     client.force_login(users[0])
     offer = create_offers[0]
     response = client.get(reverse('messages_view', kwargs={'offer_id': offer.id}))
     conversations = response.context['conversations']
-    for conversation in conversations:
-        sorted_messages = sorted(conversation['messages'], key=lambda x: x.time, reverse=True)
-        assert conversation['messages'] == sorted_messages
+    assert [conversation['partner'] for conversation in conversations] == [users[2], users[1]]
+    assert conversations[0]['last_message'].message == 'Hello'
+    assert conversations[0]['unread'] == 1
 
 
-# sprawdzanie czy pary uzytkowników do wiadomosci działają
+# jedna konwersacja na pare oferta - kandydat
 @pytest.mark.django_db
 def test_messages_grouping_by_partner(client, users, create_offers, messages):
+    Message.objects.create(message='Thanks', sender=users[1], receiver=users[0], offer=create_offers[0])
     client.force_login(users[0])
     offer = create_offers[0]
     response = client.get(reverse('messages_view', kwargs={'offer_id': offer.id}))
     conversations = response.context['conversations']
-    for conversation in conversations:
-        partner_ids = {messages.sender.id for messages in conversation['messages']}
-        partner_ids.update(msg.receiver.id for msg in conversation['messages'])
-        partner_ids.discard(users[0].id)  # Usuwam zalogowanego użytkownika zeby spr czy została tylko jedna para
-        assert len(partner_ids) == 1  # czy jest 1 unikalny partner
+    assert len(conversations) == 1
+    assert conversations[0]['partner'] == users[1]
+    assert conversations[0]['last_message'].message == 'Thanks'
+
+
+# otwarcie rozmowy zeruje nieprzeczytane, wyslanie zwieksza je rozmowcy
+@pytest.mark.django_db
+def test_topic_view_updates_conversation(client, users, create_offers, messages):
+    client.force_login(users[1])
+    client.post(reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[0].id}),
+                data={'message': 'Yes, I am interested'})
+    conversation = Conversation.objects.get(offer=create_offers[0], applicant=users[1])
+    assert conversation.last_message.message == 'Yes, I am interested'
+    assert (conversation.owner_unread, conversation.applicant_unread) == (1, 1)
+
+    client.get(reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[0].id}))
+    conversation.refresh_from_db()
+    assert (conversation.owner_unread, conversation.applicant_unread) == (1, 0)
 
 
 """testowanie widoku TopicView"""
@@ -1039,6 +1764,747 @@ def test_topic_view_not_see_rating_link(client, users, create_offers):
     assert 'Give a rating' not in response.content.decode()
 
 
+# historia rozmowy stronicowana kursorem (time, id)
+@pytest.mark.django_db
+def test_topic_history_pages(client, users, create_offers, settings, django_assert_num_queries):
+    settings.TOPIC_PAGE_SIZE = 2
+    offer = create_offers[0]
+    for i in range(5):
+        Message.objects.create(message=f'Message {i}', sender=users[i % 2], receiver=users[(i + 1) % 2], offer=offer)
+    client.force_login(users[0])
+    kwargs = {'offer_id': offer.id, 'sender_id': users[1].id}
+
+    response = client.get(reverse('topic_view', kwargs=kwargs))
+    assert [message.message for message in response.context['messages']] == ['Message 3', 'Message 4']
+
+    with django_assert_num_queries(4):
+        page = client.get(reverse('topic_history', kwargs=kwargs), {'after': response.context['older']}).json()
+    assert [message['message'] for message in page['results']] == ['Message 1', 'Message 2']
+    page = client.get(reverse('topic_history', kwargs=kwargs), {'after': page['older']}).json()
+    assert [message['message'] for message in page['results']] == ['Message 0']
+    assert page['older'] is None
+
+
+# osoba spoza rozmowy nie widzi historii
+@pytest.mark.django_db
+def test_topic_history_other_user(client, users, create_offers, messages):
+    client.force_login(users[2])
+    page = client.get(reverse('topic_history', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id}))
+    assert page.json() == {'results': [], 'older': None}
+
+
+"""testy WebSocket dla rozmów"""
+
+
+async def open_socket(path, session_key=None, origin=None):
+    inbox, outbox = asyncio.Queue(), asyncio.Queue()
+    headers = [(b'cookie', f'sessionid={session_key}'.encode())] if session_key else []
+    if origin:
+        headers.append((b'origin', origin.encode()))
+    await inbox.put({'type': 'websocket.connect'})
+    task = asyncio.ensure_future(application({'type': 'websocket', 'path': path, 'headers': headers},
+                                             inbox.get, outbox.put))
+    return inbox, outbox, task
+
+
+# nowa wiadomość i licznik nieprzeczytanych wysłane do otwartego gniazda
+@pytest.mark.django_db
+def test_conversation_socket_pushes_messages(client, users, create_offers, messages,
+                                             django_capture_on_commit_callbacks):
+    client.force_login(users[0])
+    conversation = Conversation.objects.get(offer=create_offers[0], applicant=users[1])
+
+    def reply():
+        with django_capture_on_commit_callbacks(execute=True):
+            Message.objects.create(message='Hi there', sender=users[1], receiver=users[0], offer=create_offers[0])
+
+    async def scenario():
+        inbox, outbox, task = await open_socket(f'/ws/conversations/{conversation.id}/',
+                                                client.cookies['sessionid'].value, 'http://testserver')
+        assert (await outbox.get()) == {'type': 'websocket.accept'}
+        await sync_to_async(reply)()
+        events = [json.loads((await asyncio.wait_for(outbox.get(), 1))['text']) for _ in range(2)]
+        await inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(task, 1)
+        return events
+
+    message_event, unread_event = async_to_sync(scenario)()
+    assert message_event['type'] == 'message'
+    assert message_event['message'] == 'Hi there'
+    assert message_event['sender_id'] == users[1].id
+    assert unread_event == {'type': 'unread', 'conversation': conversation.id, 'unread': 1}
+
+
+# tylko uczestnicy rozmowy z dozwolonego originu mogą się połączyć
+@pytest.mark.django_db
+@pytest.mark.parametrize("user_index,origin,path", [
+    (2, None, '/ws/conversations/{id}/'),
+    (None, None, '/ws/conversations/{id}/'),
+    (0, 'https://evil.example.com', '/ws/conversations/{id}/'),
+    (0, None, '/ws/other/'),
+])
+def test_conversation_socket_rejected(client, users, create_offers, messages, user_index, origin, path):
+    conversation = Conversation.objects.get(offer=create_offers[0], applicant=users[1])
+    session_key = None
+    if user_index is not None:
+        client.force_login(users[user_index])
+        session_key = client.cookies['sessionid'].value
+
+    async def scenario():
+        inbox, outbox, task = await open_socket(path.format(id=conversation.id), session_key, origin)
+        await asyncio.wait_for(task, 1)
+        return await outbox.get()
+
+    event = async_to_sync(scenario)()
+    assert event['type'] == 'websocket.close'
+    assert event['code'] in (4403, 4404)
+
+
+"""testy long-poll dla nowych wiadomości"""
+
+
+# bez kursora zwracany jest kursor najnowszej wiadomości, z kursorem - nowsze wiadomości
+@pytest.mark.django_db
+def test_topic_updates_newer_messages(client, users, create_offers, messages):
+    client.force_login(users[0])
+    url = reverse('topic_updates', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id})
+    after = client.get(url).json()['after']
+    Message.objects.create(message='Still there?', sender=users[1], receiver=users[0], offer=create_offers[0])
+    data = client.get(url, {'after': after}).json()
+    assert [message['message'] for message in data['results']] == ['Still there?']
+    assert data['after'] != after
+
+
+# brak nowych wiadomości - odpowiedź po upływie limitu czasu
+@pytest.mark.django_db
+def test_topic_updates_timeout(client, users, create_offers, messages, settings):
+    settings.LONG_POLL_TIMEOUT = 0.05
+    client.force_login(users[0])
+    url = reverse('topic_updates', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id})
+    after = client.get(url).json()['after']
+    assert client.get(url, {'after': after}).json() == {'results': [], 'after': after}
+    assert client.get(url, {'after': 'broken'}).status_code == 400
+    # ["2026-01-01T00:00:00+00:00", "abc"] - id, który nie jest liczbą
+    assert client.get(url, {'after': 'WyIyMDI2LTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwiYWJjIl0'}).status_code == 400
+
+
+# oczekujące żądanie budzi nowa wiadomość
+@pytest.mark.django_db
+def test_topic_updates_wakes_up(users, create_offers, messages, settings, django_capture_on_commit_callbacks):
+    settings.LONG_POLL_TIMEOUT = 5
+    async_client = AsyncClient()
+    async_client.force_login(users[0])
+    url = reverse('topic_updates', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id})
+
+    def reply():
+        with django_capture_on_commit_callbacks(execute=True):
+            Message.objects.create(message='Here I am', sender=users[1], receiver=users[0], offer=create_offers[0])
+
+    async def scenario():
+        after = (await async_client.get(url)).json()['after']
+        waiting = asyncio.ensure_future(async_client.get(url, {'after': after}))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        await sync_to_async(reply)()
+        return (await asyncio.wait_for(waiting, 1)).json()
+
+    data = async_to_sync(scenario)()
+    assert [message['message'] for message in data['results']] == ['Here I am']
+
+
+# wymagane logowanie
+@pytest.mark.django_db
+def test_topic_updates_anonymous(client, create_offers, users):
+    url = reverse('topic_updates', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id})
+    assert client.get(url).status_code == 401
+
+
+"""testy liczników nieprzeczytanych wiadomości"""
+
+
+# licznik w pasku nawigacji bez zapytań liczących
+@pytest.mark.django_db
+def test_navbar_unread_badge(client, users, create_offers, messages, django_assert_num_queries):
+    client.force_login(users[0])
+    with django_assert_num_queries(2):  # sesja + użytkownik
+        response = client.get(reverse('start'))
+    assert response.context['unread_messages'] == 1
+    assert '<span class="badge bg-danger">1</span>' in response.content.decode()
+
+
+# licznik zmieniany przyrostowo przy zapisie i odczycie
+@pytest.mark.django_db
+def test_unread_total_incremental(client, users, create_offers, messages, django_capture_on_commit_callbacks):
+    client.force_login(users[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        Message.objects.create(message='Another one', sender=users[2], receiver=users[0], offer=create_offers[2])
+        Message.objects.create(message='Any news?', sender=users[1], receiver=users[0], offer=create_offers[0])
+    assert cache.get(f'unread:{users[0].id}') == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.get(reverse('topic_view', kwargs={'offer_id': create_offers[2].id, 'sender_id': users[2].id}))
+    assert cache.get(f'unread:{users[0].id}') == 1
+    cache.delete(f'unread:{users[0].id}')
+    assert get_unread_total(users[0].id) == 1
+
+
+# potwierdzenie przeczytania widoczne dla nadawcy
+@pytest.mark.django_db
+def test_read_receipt(client, users, create_offers, messages):
+    kwargs = {'offer_id': create_offers[0].id, 'sender_id': users[0].id}
+    client.force_login(users[0])
+    response = client.get(reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id}))
+    assert 'seen' not in response.content.decode()
+
+    client.force_login(users[1])
+    client.get(reverse('topic_view', kwargs=kwargs))
+    conversation = Conversation.objects.get(offer=create_offers[0], applicant=users[1])
+    assert conversation.applicant_read_at is not None
+    assert conversation.applicant_unread == 0
+
+    client.force_login(users[0])
+    response = client.get(reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[1].id}))
+    assert 'seen' in response.content.decode()
+
+
+"""testy wyszukiwania wiadomości"""
+
+
+# nie zalogowany
+def test_message_search_stranger(client):
+    response = client.get(reverse('message_search'), {'q': 'job'})
+    assert '/login/' in response.url
+
+
+# tylko wiadomosci wyslane lub odebrane przez uzytkownika
+@pytest.mark.django_db
+def test_message_search_only_own_messages(client, users, messages):
+    client.force_login(users[0])
+    response = client.get(reverse('message_search'), {'q': 'position'})
+    assert [result['message'] for result in response.context['results']] == [messages[2]]
+    assert response.context['results'][0]['partner'] == users[2]
+
+    client.force_login(users[1])
+    response = client.get(reverse('message_search'), {'q': 'position'})
+    assert response.context['results'] == []
+
+
+# wszystkie slowa jako prefiksy, podswietlone w fragmencie
+@pytest.mark.django_db
+def test_message_search_prefixes_and_snippet(client, users, messages):
+    client.force_login(users[1])
+    response = client.get(reverse('message_search'), {'q': 'avail JOB'})
+    results = response.context['results']
+    assert [result['message'] for result in results] == [messages[0]]
+    assert '<mark>job</mark>' in results[0]['snippet']
+    assert '<mark>available</mark>' in results[0]['snippet']
+
+
+# tresc wiadomosci jest escapowana
+@pytest.mark.django_db
+def test_message_search_snippet_escaped(client, users, create_offers):
+    Message.objects.create(message='<script>visa</script>', sender=users[1], receiver=users[0], offer=create_offers[0])
+    client.force_login(users[0])
+    response = client.get(reverse('message_search'), {'q': 'visa'})
+    content = response.content.decode()
+    assert '&lt;script&gt;<mark>visa</mark>&lt;/script&gt;' in content
+    assert '<script>visa' not in content
+
+
+# stronicowanie kursorem
+@pytest.mark.django_db
+def test_message_search_keyset_pages(client, users, create_offers):
+    for i in range(5):
+        Message.objects.create(message=f'Visa question {i}', sender=users[1], receiver=users[0], offer=create_offers[0])
+    client.force_login(users[0])
+    first = client.get(reverse('message_search'), {'q': 'visa', 'page_size': 3}).context
+    assert len(first['results']) == 3
+    second = client.get(reverse('message_search'), {'q': 'visa', 'page_size': 3, 'after': first['page'].next_cursor})
+    assert len(second.context['results']) == 2
+    assert not second.context['page'].has_next()
+    found = {result['message'].id for result in first['results'] + second.context['results']}
+    assert found == set(Message.objects.values_list('id', flat=True))
+
+
+"""testy limitów wysyłania"""
+
+
+@pytest.mark.parametrize("rate,expected", [('30/m', (30, 60)), ('5/10m', (5, 600)), ('100/day', (100, 86400))])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
+
+
+@pytest.mark.parametrize("rate", ['0/m', '5', '5/w', 'fast'])
+def test_parse_rate_invalid(rate):
+    with pytest.raises(ValueError):
+        parse_rate(rate)
+
+
+# po wyczerpaniu limitu 429 z Retry-After, inni użytkownicy nadal mogą pisać
+@pytest.mark.django_db
+def test_topic_post_rate_limited(client, users, create_offers, settings):
+    settings.RATE_LIMITS = {'message': '2/m'}
+    url = reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[0].id})
+    client.force_login(users[1])
+    for i in range(2):
+        assert client.post(url, data={'message': f'Message {i}'}).status_code == 302
+    response = client.post(url, data={'message': 'Spam'})
+    assert response.status_code == 429
+    assert response['Retry-After'] == '30'
+    assert not Message.objects.filter(message='Spam').exists()
+    assert client.get(url).status_code == 200
+
+    client.force_login(users[2])
+    assert client.post(url, data={'message': 'Other user'}).status_code == 302
+
+
+# żetony odnawiają się z czasem
+@pytest.mark.django_db
+def test_rate_limit_refills(client, users, create_offers, settings, monkeypatch):
+    settings.RATE_LIMITS = {'message': '1/m'}
+    now = [1000.0]
+    monkeypatch.setattr('work_and_travel_app.ratelimit.time.time', lambda: now[0])
+    url = reverse('topic_view', kwargs={'offer_id': create_offers[0].id, 'sender_id': users[0].id})
+    client.force_login(users[1])
+    assert client.post(url, data={'message': 'First'}).status_code == 302
+    now[0] += 45
+    response = client.post(url, data={'message': 'Too early'})
+    assert (response.status_code, response['Retry-After']) == (429, '15')
+    now[0] += 15
+    assert client.post(url, data={'message': 'Second'}).status_code == 302
+
+
+# równoległe żądania nie biorą tego samego żetonu
+def test_rate_limit_concurrent_requests(settings, monkeypatch):
+    settings.RATE_LIMITS = {'message': '3/m'}
+
+    class SlowCache:
+        # Widens the window between reading and writing the bucket.
+        def __getattr__(self, name):
+            return getattr(cache, name)
+
+        def get(self, *args, **kwargs):
+            value = cache.get(*args, **kwargs)
+            time.sleep(0.01)
+            return value
+
+    monkeypatch.setattr('work_and_travel_app.ratelimit.cache', SlowCache())
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        waits = list(executor.map(lambda _: take_token('message', 'user:1'), range(8)))
+    assert waits.count(0) == 3
+
+    cache.add(rate_limit_key('message', 'user:2') + ':lock', 1)
+    monkeypatch.setattr('work_and_travel_app.ratelimit.LOCK_ATTEMPTS', 2)
+    assert take_token('message', 'user:2') == 20
+
+
+# rejestracja ograniczona per adres IP
+@pytest.mark.django_db
+def test_registration_rate_limited(client, settings):
+    settings.RATE_LIMITS = {'register': '1/h'}
+    data = {'username': 'spammer', 'first_name': 'S', 'last_name': 'S', 'password': 'pass12345', 're_password': 'x'}
+    assert client.post(reverse('register_view'), data).status_code == 200
+    response = client.post(reverse('register_view'), data)
+    assert response.status_code == 429
+    assert response['Retry-After'] == '3600'
+
+
+"""testy wiadomości do wszystkich kandydatów"""
+
+
+# tylko właściciel oferty może wysłać wiadomość do wszystkich
+@pytest.mark.django_db
+def test_broadcast_only_owner(client, users, create_offers, messages):
+    url = reverse('broadcast', kwargs={'offer_id': create_offers[0].id})
+    assert '/login/' in client.get(url).url
+    client.force_login(users[1])
+    assert client.post(url, data={'message': 'Hi all'}).status_code == 404
+    assert client.get(url).status_code == 404
+    assert not Message.objects.filter(message='Hi all').exists()
+
+
+# jedna wiadomość na kandydata, rozmowy i liczniki zaktualizowane
+@pytest.mark.django_db
+def test_broadcast_to_applicants(client, users, create_offers, messages, settings, django_capture_on_commit_callbacks):
+    settings.TASKS_ALWAYS_EAGER = True
+    offer = create_offers[0]
+    Message.objects.create(message='Me too', sender=users[2], receiver=users[0], offer=offer)
+    unread_before = get_unread_total(users[1].id)
+    counters = dict(Conversation.objects.filter(offer=offer).values_list('id', 'applicant_unread'))
+    client.force_login(users[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse('broadcast', kwargs={'offer_id': offer.id}), data={'message': 'Hi all'})
+    assert response.url == reverse('messages_view', kwargs={'offer_id': offer.id})
+
+    sent = Message.objects.filter(message='Hi all')
+    assert sorted(sent.values_list('receiver_id', flat=True)) == [users[1].id, users[2].id]
+    for conversation in Conversation.objects.filter(offer=offer):
+        assert conversation.last_message.message == 'Hi all'
+        assert conversation.applicant_unread == counters[conversation.id] + 1
+    assert get_unread_total(users[1].id) == unread_before + 1
+    cache.clear()
+    assert get_unread_total(users[1].id) == unread_before + 1
+
+
+# liczba kandydatów nie obejmuje rozmowy właściciela z samym sobą
+@pytest.mark.django_db
+def test_broadcast_applicants_count(client, users, create_offers, messages):
+    offer = create_offers[0]
+    Message.objects.create(message='Note to self', sender=users[0], receiver=users[0], offer=offer)
+    client.force_login(users[0])
+    response = client.get(reverse('broadcast', kwargs={'offer_id': offer.id}))
+    assert Conversation.objects.filter(offer=offer).count() == 2
+    assert response.context['applicants'] == 1
+
+
+# stała liczba zapytań niezależnie od liczby kandydatów
+@pytest.mark.django_db
+@pytest.mark.parametrize("applicants", [1, 5])
+def test_broadcast_query_count(client, users, create_offers, django_assert_num_queries, applicants):
+    offer = create_offers[0]
+    for i in range(applicants):
+        applicant = User.objects.create_user(username=f'applicant{i}', password='testpassword')
+        Message.objects.create(message='Hello', sender=applicant, receiver=users[0], offer=offer)
+    client.force_login(users[0])
+    # sesja + użytkownik + oferta + rozmowy + savepoint, INSERT, UPDATE, release
+    with django_assert_num_queries(8):
+        client.post(reverse('broadcast', kwargs={'offer_id': offer.id}), data={'message': 'Hi all'})
+    assert Message.objects.filter(message='Hi all').count() == applicants
+
+
+"""testy archiwizacji starych rozmów"""
+
+
+@pytest.fixture
+def old_conversation(users, create_offers):
+    offer = create_offers[0]
+    for i in range(5):
+        Message.objects.create(message=f'Old message {i}', sender=users[i % 2], receiver=users[(i + 1) % 2], offer=offer)
+    long_ago = timezone.now() - timedelta(days=400)
+    for i, message in enumerate(Message.objects.filter(offer=offer).order_by('id')):
+        Message.objects.filter(pk=message.pk).update(time=long_ago + timedelta(minutes=i))
+    Conversation.objects.filter(offer=offer).update(last_activity=long_ago + timedelta(minutes=4))
+    Offer.objects.filter(pk=offer.pk).update(is_active=False)
+    return offer
+
+
+# rozmowy nieaktywnych ofert trafiają do skompresowanego archiwum
+@pytest.mark.django_db
+def test_archive_messages_command(users, create_offers, messages, old_conversation):
+    out = StringIO()
+    call_command('archive_messages', days=180, stdout=out)
+    # 5 starych wiadomości + pierwsza wiadomość z fixture messages w tej samej rozmowie
+    assert out.getvalue().strip() == 'Archived 6 messages from 1 conversations.'
+    assert not Message.objects.filter(offer=old_conversation).exists()
+    archive = ArchivedConversation.objects.get()
+    assert archive.message_count == 6
+    assert archive.conversation_id == Conversation.objects.get(offer=old_conversation).id
+    # pozostałe rozmowy są aktywne lub świeże
+    assert Message.objects.count() == 2
+
+
+# wiadomości z ocenami zostają w tabeli wiadomości
+@pytest.mark.django_db
+def test_archive_skips_graded_conversations(users, old_conversation):
+    Grade.objects.create(grade=4, user=users[0], description='Good', message=Message.objects.first())
+    call_command('archive_messages', days=180, stdout=StringIO())
+    assert Message.objects.filter(offer=old_conversation).count() == 5
+    assert not ArchivedConversation.objects.exists()
+
+
+# usunięcie oferty lub kandydata usuwa ich zarchiwizowane rozmowy
+@pytest.mark.django_db
+def test_archive_purged_with_offer_and_applicant(users, create_offers, messages, old_conversation):
+    call_command('archive_messages', days=180, stdout=StringIO())
+    archive = ArchivedConversation.objects.get()
+    ArchivedConversation.objects.create(
+        conversation_id=archive.conversation_id + 1, offer_id=create_offers[1].id, owner_id=users[1].id,
+        applicant_id=users[2].id, first_message_time=archive.first_message_time,
+        last_message_time=archive.last_message_time, message_count=1, payload=archive.payload,
+    )
+    old_conversation.delete()
+    assert list(ArchivedConversation.objects.values_list('offer_id', flat=True)) == [create_offers[1].id]
+    users[2].delete()
+    assert not ArchivedConversation.objects.exists()
+
+
+# zarchiwizowana historia jest nadal widoczna w rozmowie
+@pytest.mark.django_db
+def test_topic_reads_archived_history(client, users, old_conversation, settings):
+    call_command('archive_messages', days=180, stdout=StringIO())
+    settings.TOPIC_PAGE_SIZE = 2
+    Message.objects.create(message='New message', sender=users[1], receiver=users[0], offer=old_conversation)
+    client.force_login(users[0])
+    kwargs = {'offer_id': old_conversation.id, 'sender_id': users[1].id}
+
+    response = client.get(reverse('topic_view', kwargs=kwargs))
+    assert [message.message for message in response.context['messages']] == ['Old message 4', 'New message']
+    assert 'Old message 4' in response.content.decode()
+
+    page = client.get(reverse('topic_history', kwargs=kwargs), {'after': response.context['older']}).json()
+    assert [message['message'] for message in page['results']] == ['Old message 2', 'Old message 3']
+    page = client.get(reverse('topic_history', kwargs=kwargs), {'after': page['older']}).json()
+    assert [message['message'] for message in page['results']] == ['Old message 0', 'Old message 1']
+    assert page['older'] is None
+
+
+"""testy reputacji użytkowników"""
+
+
+# oceny i odpowiedzi aktualizują reputację właściciela oferty
+@pytest.mark.django_db
+def test_reputation_follows_ratings(client, users, create_offers, messages):
+    client.force_login(users[2])
+    url = reverse('grade_view', kwargs={'offer_id': create_offers[2].id, 'sender_id': users[2].id})
+    client.post(url, {'grade': 4, 'description': 'Good'})
+    reputation = Reputation.objects.get(user=users[2])
+    assert (reputation.grades_count, reputation.grades_sum, reputation.grades_histogram) == (1, 4, [0, 0, 0, 1, 0])
+
+    client.post(url, {'grade': 2, 'description': 'Changed my mind'})
+    reputation.refresh_from_db()
+    assert (reputation.grades_count, reputation.grades_sum, reputation.grades_histogram) == (1, 2, [0, 1, 0, 0, 0])
+
+    client.post(reverse('answer_view', kwargs={'grade_id': Grade.objects.get().id}), {'text': 'Thanks', 'grade_answer': 5})
+    reputation.refresh_from_db()
+    assert (reputation.answers_count, reputation.answers_histogram) == (1, [0, 0, 0, 0, 1])
+    assert reputation.average == 3.5
+    assert check_reputations() == []
+
+
+# usunięcie oferty usuwa jej oceny z reputacji
+@pytest.mark.django_db
+def test_reputation_after_offer_deleted(users, create_offers, grade, answer, django_capture_on_commit_callbacks):
+    assert Reputation.objects.get(user=users[2]).average == 4.5
+    assert get_leaderboard().ranking().rank(users[2].id) == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        create_offers[2].delete()
+    assert not Reputation.objects.filter(user=users[2]).exists()
+    # przebudowany ranking - bez ocen nie ma żadnych pozycji
+    assert get_leaderboard().ranking() is None
+    assert not RatingRollup.objects.exists()
+    assert check_reputations() == []
+
+
+# usunięcie oferty nie liczy reputacji ocena po ocenie - stała liczba zapytań
+@pytest.mark.django_db
+@pytest.mark.parametrize("ratings", [1, 10])
+def test_offer_delete_query_count(users, create_offers, messages, django_assert_num_queries,
+                                  django_capture_on_commit_callbacks, ratings):
+    for i in range(ratings):
+        grade = Grade.objects.create(grade=i % 5 + 1, user=users[0], description='Rated', message=messages[2])
+        Answer.objects.create(answer=grade, grade_answer=5 - i % 5, text='Thanks')
+    with django_capture_on_commit_callbacks(execute=True), django_assert_num_queries(15):
+        create_offers[2].delete()
+    assert not Grade.objects.exists()
+    assert check_reputations() == []
+
+
+# usunięcie użytkownika przelicza reputację i podsumowania ocenionych przez niego właścicieli
+@pytest.mark.django_db
+def test_reputation_after_user_deleted(users, create_offers, messages, grade, answer,
+                                       django_capture_on_commit_callbacks):
+    Grade.objects.create(grade=2, user=users[2], description='Meh', message=messages[1])
+    Grade.objects.create(grade=4, user=users[0], description='Good', message=messages[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        users[0].delete()
+    assert check_reputations() == []
+    assert rollup_counts() == {('grade', 2): 1}
+    assert not Reputation.objects.filter(user=users[2]).exists()
+    assert Reputation.objects.get(user=users[1]).grades_histogram == [0, 1, 0, 0, 0]
+
+
+# profil korzysta z zapisanej reputacji
+@pytest.mark.django_db
+def test_profile_uses_reputation(client, users, grade, answer, django_assert_num_queries):
+    client.force_login(users[2])
+    # sesja + użytkownik + dane podstawowe + reputacja + dane podstawowe z szablonu
+    with django_assert_num_queries(5):
+        response = client.get(reverse('your_profile'))
+    assert response.context['avg_grade'] == 4.5
+
+
+# sprawdzenie spójności i przebudowa
+@pytest.mark.django_db
+def test_check_and_rebuild_reputation(users, grade, answer):
+    Reputation.objects.filter(user=users[2]).update(grades_sum=1, grade_5=0)
+    out = StringIO()
+    with pytest.raises(CommandError):
+        call_command('check_reputation', stdout=out)
+    assert f'User {users[2].id}: grades_sum is 1, expected 5.' in out.getvalue()
+
+    out = StringIO()
+    call_command('rebuild_reputation', stdout=out)
+    assert out.getvalue().strip() == 'Rebuilt reputation of 1 users.'
+    out = StringIO()
+    call_command('check_reputation', stdout=out)
+    assert out.getvalue().strip() == 'Reputations are consistent.'
+
+
+"""testy rankingu najlepiej ocenianych właścicieli"""
+
+
+# średnia bayesowska - jedna piątka nie wygrywa z wieloma dobrymi ocenami
+def test_ranking_bayesian_order():
+    ranking = Ranking(prior_mean=3, prior_weight=5)
+    ranking.add(1, 1, 5)
+    ranking.add(2, 10, 46)
+    ranking.add(3, 2, 4)
+    assert [row['owner_id'] for row in ranking.top(10)] == [2, 1, 3]
+    assert (ranking.rank(2), ranking.rank(1), ranking.rank(3), ranking.rank(4)) == (1, 2, 3, None)
+
+    ranking.add(1, 20, 100)
+    assert ranking.rank(1) == 1
+    ranking.add(1, -21, -105)
+    assert ranking.rank(1) is None
+    assert len(ranking) == 2
+
+
+@pytest.fixture
+def ranked_grades(users, create_offers, messages, grade):
+    return Grade.objects.create(grade=3, user=users[0], description='Fine', message=messages[0])
+
+
+# ranking ogólny, po kraju i po kategorii oraz pozycja zalogowanego użytkownika
+@pytest.mark.django_db
+def test_leaderboard_view(client, users, create_categories, ranked_grades):
+    response = client.get(reverse('leaderboard'))
+    assert [row['owner'] for row in response.context['top']] == [users[2], users[0]]
+    assert response.context['countries'] == ['Poland', 'UK']
+
+    response = client.get(reverse('leaderboard'), {'country': 'UK'})
+    assert [row['owner'] for row in response.context['top']] == [users[2]]
+    response = client.get(reverse('leaderboard'), {'category': create_categories[0].id})
+    assert [row['owner'] for row in response.context['top']] == [users[0]]
+
+    client.force_login(users[0])
+    response = client.get(reverse('leaderboard'))
+    assert response.context['your_rank'] == 2
+    assert 'Your position: 2 of 2' in response.content.decode()
+
+
+# zmiany ocen aktualizują ranking bez przebudowy, także w innych procesach
+@pytest.mark.django_db
+def test_leaderboard_incremental_updates(users, create_offers, messages, ranked_grades,
+                                         django_capture_on_commit_callbacks):
+    leaderboard = get_leaderboard()
+    other_process = Leaderboard.build(leaderboard.version)
+    with django_capture_on_commit_callbacks(execute=True):
+        ranked_grades.grade = 5
+        ranked_grades.save()
+        Grade.objects.create(grade=1, user=users[1], description='Bad', message=messages[1])
+        Grade.objects.get(grade=5, message=messages[2]).delete()
+
+    assert get_leaderboard() is leaderboard
+    rebuilt = Leaderboard.build(leaderboard.version)
+    assert other_process.catch_up(leaderboard.version)
+    for scope, ranking in rebuilt.rankings.items():
+        assert leaderboard.rankings[scope].totals == ranking.totals
+        assert other_process.rankings[scope].totals == ranking.totals
+    assert all(not ranking.totals for scope, ranking in leaderboard.rankings.items() if scope not in rebuilt.rankings)
+
+
+# ranking zmienia się dopiero po zatwierdzeniu transakcji
+@pytest.mark.django_db
+def test_leaderboard_waits_for_commit(users, create_offers, messages, ranked_grades,
+                                      django_capture_on_commit_callbacks):
+    leaderboard = get_leaderboard()
+    version = leaderboard.version
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        Grade.objects.create(grade=1, user=users[1], description='Bad', message=messages[1])
+    assert len(callbacks) == 1
+    assert (leaderboard.version, leaderboard.ranking().rank(users[1].id)) == (version, None)
+    assert get_version('leaderboard') == version
+
+    callbacks[0]()
+    assert get_leaderboard() is leaderboard
+    assert leaderboard.ranking().rank(users[1].id) == 3
+
+
+# brakująca zmiana w cache - przebudowa zamiast błędnego rankingu
+@pytest.mark.django_db
+def test_leaderboard_rebuilds_without_changes(users, create_offers, messages, ranked_grades,
+                                              django_capture_on_commit_callbacks):
+    leaderboard = get_leaderboard()
+    with django_capture_on_commit_callbacks(execute=True):
+        Grade.objects.create(grade=1, user=users[1], description='Bad', message=messages[1])
+    cache.delete(f'leaderboard:change:{get_version("leaderboard")}')
+    stale = Leaderboard.build(leaderboard.version - 1)
+    assert not stale.catch_up(get_version('leaderboard'))
+
+
+"""testy analityki ocen"""
+
+
+def rollup_counts(**filters):
+    return {
+        (rollup.kind, rollup.value): rollup.count for rollup in RatingRollup.objects.filter(**filters) if rollup.count
+    }
+
+
+# zapis, zmiana i usunięcie oceny lub odpowiedzi aktualizują dzienne podsumowania
+@pytest.mark.django_db
+def test_rating_rollups_follow_ratings(users, create_offers, grade, answer):
+    assert rollup_counts(owner=users[2], offer=create_offers[2]) == {('grade', 5): 1, ('answer', 4): 1}
+    assert RatingRollup.objects.get(kind='grade').day == timezone.localdate(grade.created)
+
+    grade.grade = 2
+    grade.save()
+    assert rollup_counts(owner=users[2]) == {('grade', 2): 1, ('answer', 4): 1}
+
+    answer.delete()
+    assert rollup_counts(owner=users[2]) == {('grade', 2): 1}
+    grade.delete()
+    assert rollup_counts() == {}
+
+
+@pytest.fixture
+def rating_months(users, create_offers, messages):
+    january, march = timezone.now().replace(2024, 1, 15), timezone.now().replace(2024, 3, 10)
+    grades = [
+        Grade.objects.create(grade=value, user=users[0], description='Rated', message=messages[2], created=created)
+        for value, created in ((5, january), (3, january), (4, march))
+    ]
+    Answer.objects.create(answer=grades[0], grade_answer=4, text='Thanks', created=january)
+    Grade.objects.create(grade=1, user=users[1], description='Rated', message=messages[0], created=march)
+    return grades
+
+
+# rozkład, trend miesięczny i porównanie odpowiedzi z ocenami liczone bez czytania ocen
+@pytest.mark.django_db
+def test_rating_analytics_view(client, users, create_offers, rating_months):
+    client.force_login(users[2])
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('rating_analytics'))
+    assert not [query['sql'] for query in queries if 'work_and_travel_app_grade' in query['sql']]
+
+    analytics = response.context['analytics']
+    assert [(row['value'], row['grade'], row['answer']) for row in analytics['distribution']] == [
+        (1, 0, 0), (2, 0, 0), (3, 1, 0), (4, 1, 1), (5, 1, 0),
+    ]
+    assert (analytics['grade']['count'], analytics['grade']['average'], analytics['difference']) == (3, 4, 0)
+    assert [(month['month'], month['grade']['count'], month['grade']['average'], month['answer']['count'])
+            for month in analytics['trend']] == [(date(2024, 1, 1), 2, 4, 1), (date(2024, 3, 1), 1, 4, 0)]
+    assert [(row['name'], row['grade']['count'], row['answer']['average'])
+            for row in response.context['offers']] == [('Graphic Designer', 3, 4)]
+
+    response = client.get(reverse('rating_analytics'), {'since': '2024-02-01'})
+    assert response.context['analytics']['grade']['histogram'] == [0, 0, 0, 1, 0]
+    assert response.context['analytics']['difference'] is None
+
+
+# analityka jednej oferty tylko dla jej właściciela
+@pytest.mark.django_db
+def test_rating_analytics_offer(client, users, create_offers, rating_months):
+    client.force_login(users[2])
+    response = client.get(reverse('rating_analytics'), {'offer': create_offers[2].id, 'until': '2024-01-31'})
+    assert response.context['offer'] == create_offers[2]
+    assert response.context['analytics']['grade']['histogram'] == [0, 0, 1, 0, 1]
+    assert response.context['offers'] == []
+
+    response = client.get(reverse('rating_analytics'), {'offer': create_offers[0].id})
+    assert response.status_code == 404
+
+
 """testy do GradeViews"""
 
 
@@ -1105,6 +2571,33 @@ def test_your_grades_view_grades(client, users, create_offers, messages, grade):
     assert grade_info['grade_value'] == 5
 
 
+# historia ocen z odpowiedziami - stała liczba zapytań, stronicowanie kursorem
+@pytest.mark.django_db
+@pytest.mark.parametrize("grades_count", [1, 5])
+def test_your_grades_history_pages(client, users, create_offers, django_assert_num_queries, grades_count):
+    for i in range(grades_count):
+        message = Message.objects.create(message=f'Hi {i}', sender=users[1], receiver=users[2], offer=create_offers[2])
+        grade = Grade.objects.create(grade=i % 5 + 1, user=users[1], description=f'Grade {i}', message=message)
+        Answer.objects.create(answer=grade, grade_answer=5 - i % 5, text=f'Answer {i}')
+    client.force_login(users[1])
+    with django_assert_num_queries(3):  # sesja + użytkownik + oceny z odpowiedziami
+        response = client.get(reverse('your_grades_history'), {'page_size': 2})
+    page = response.json()
+    newest = page['results'][0]
+    assert newest['owner_names'] == 'user3'
+    assert (newest['description'], newest['answer_text']) == (f'Grade {grades_count - 1}', f'Answer {grades_count - 1}')
+
+    seen = [entry['id'] for entry in page['results']]
+    while page['next']:
+        page = client.get(reverse('your_grades_history'), {'page_size': 2, 'after': page['next']}).json()
+        seen.extend(entry['id'] for entry in page['results'])
+    assert seen == list(Grade.objects.order_by('-id').values_list('id', flat=True))
+
+    response = client.get(reverse('your_grades'), {'page_size': 2})
+    assert len(response.context['grades_list']) == min(grades_count, 2)
+    assert 'Answer' in response.content.decode()
+
+
 """testy do widoku AnswerGradeView"""
 
 
@@ -1146,3 +2639,91 @@ def test_get_answer_view_wrong_user(client, users, create_offers, messages, grad
     response = client.get(reverse('answer_view', kwargs={'grade_id': grade.id}))
     assert response.url == reverse('your_grades')
 
+
+"""testy planów zapytań - EXPLAIN bez skanów sekwencyjnych"""
+
+
+@pytest.fixture
+def seeded_dataset(db, users, create_categories):
+    Category.objects.bulk_create([Category(name=f'Seeded category {i}') for i in range(50)])
+    owners = users + User.objects.bulk_create([User(username=f'owner{i}') for i in range(27)])
+    countries = ['Poland', 'Spain', 'Canada', 'UK', 'Germany', 'Italy']
+    offers = Offer.objects.bulk_create([
+        Offer(
+            name=f'Seeded offer {i}', country=countries[i % len(countries)], city=f'City {i % 10}',
+            description='Seeded.', offer_type='job offer' if i % 2 else 'job seekers',
+            since_when=date(2024, 1, 1) + timedelta(days=i % 30), until_when=date(2024, 3, 1) + timedelta(days=i),
+            only_for_women=i % 5 == 0, owner=owners[i % len(owners)], is_active=i % 4 != 0,
+        )
+        for i in range(300)
+    ])
+    Offer.category.through.objects.bulk_create([
+        Offer.category.through(offer_id=offer.id, category_id=create_categories[i % 3].id)
+        for i, offer in enumerate(offers)
+    ])
+    Message.objects.bulk_create([
+        Message(message=f'Message {i}', offer=offers[i % 50], sender=users[i % 3], receiver=users[(i + 1) % 3])
+        for i in range(600)
+    ])
+    conversations = {}
+    seeded_messages = list(Message.objects.select_related('offer').order_by('time', 'id'))
+    for message in seeded_messages:
+        owner_id = message.offer.owner_id
+        applicant_id = message.receiver_id if message.sender_id == owner_id else message.sender_id
+        message.key = (message.offer_id, applicant_id)
+        conversations[message.key] = Conversation(
+            offer_id=message.offer_id, applicant_id=applicant_id, owner_id=owner_id,
+            last_message=message, last_activity=message.time,
+        )
+    Conversation.objects.bulk_create(conversations.values())
+    for message in seeded_messages:
+        message.conversation = conversations[message.key]
+    Message.objects.bulk_update(seeded_messages, ['conversation'])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return offers
+
+
+def sequential_scans(captured_queries):
+    scans = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for query in captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'work_and_travel_app_' not in sql:
+                continue
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                found = re.findall(r'Seq Scan on (work_and_travel_app_\w+)', plan)
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                found = re.findall(r'SCAN (work_and_travel_app_\w+)\b(?! USING)', plan)
+            scans.extend((table, sql, plan) for table in found)
+    return scans
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name,kwargs,params", [
+    ('offers_list', {}, {}),
+    ('offers_list', {}, {'country': 'Spain', 'page_size': 5}),
+    ('your_offers', {}, {}),
+    ('message_box', {}, {}),
+    ('messages_view', {'offer_id': 0}, {}),
+    ('topic_view', {'offer_id': 0, 'sender_id': 2}, {}),
+    ('topic_history', {'offer_id': 0, 'sender_id': 2}, {}),
+    ('message_search', {}, {'q': 'message 1'}),
+    ('your_grades', {}, {}),
+    ('rating_analytics', {}, {}),
+    ('grade_view', {'offer_id': 0, 'sender_id': 2}, {}),
+])
+def test_views_use_indexes(client, users, seeded_dataset, url_name, kwargs, params):
+    if 'offer_id' in kwargs:
+        kwargs = dict(kwargs, offer_id=seeded_dataset[0].id)
+    client.force_login(users[0])
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse(url_name, kwargs=kwargs), params)
+    assert response.status_code == 200
+    assert sequential_scans(queries.captured_queries) == []
@@ -1,24 +1,49 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.db.models import Q, Prefetch, Avg, FloatField
-from django.db.models.functions import Coalesce
-from django.http import HttpResponseRedirect
+from django.db import transaction
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
 from django.views import View
 
 from work_and_travel_app.forms import OfferForm, AddBaseInfoForm, MessageForm, GradeForm, AnswerForm
-from work_and_travel_app.models import BaseInformation, Offer, Message, Category, Grade, Answer
+from work_and_travel_app.models import BaseInformation, Offer, Message, Category, Grade, Answer, Conversation
+from work_and_travel_app.analytics import offer_rating_summaries, parse_day, rating_analytics
+from work_and_travel_app.archive import continue_from_archive
+from work_and_travel_app.autocomplete import suggest_locations
+from work_and_travel_app.availability import availability_calendar, filter_available, parse_availability
+from work_and_travel_app.conversations import broadcast_conversations, broadcast_message, find_conversation, \
+    mark_read, message_payload, messages_after, topic_applicant_id, topic_conversation_ids, topic_messages, \
+    user_conversations
+from work_and_travel_app.facets import apply_facet_filters, get_facets, parse_facet_filters
+from work_and_travel_app.geo import nearby_offers
+from work_and_travel_app.geocoding import geocode_offers
+from work_and_travel_app.leaderboard import get_leaderboard
+from work_and_travel_app.locations import fuzzy_location_offers, match_locations
+from work_and_travel_app.pagination import KeysetPage, KeysetPaginator, encode_cursor, get_page_size
+from work_and_travel_app.pubsub import conversation_channel, get_broker
+from work_and_travel_app.ratelimit import RateLimitMixin
+from work_and_travel_app.reputation import get_reputation, rating_history, rating_history_entry, \
+    with_owner_rating
+from work_and_travel_app.search import message_snippet, search_messages, search_offers, search_terms
+from work_and_travel_app.tasks import run_async
 
 
 class StartView(View):
 
     def get(self, request):
-        search_country = request.GET.get('search', '')
-        offers = Offer.objects.filter(is_active=True)
+        search = request.GET.get('search', '')
 
-        if search_country:
-            return HttpResponseRedirect(f'/offers_list/?search={search_country}')
+        if search:
+            return HttpResponseRedirect(f"{reverse('offers_list')}?{urlencode({'search': search})}")
 
         return render(request, 'start.html')
 
@@ -29,21 +54,28 @@ class YourProfile(LoginRequiredMixin, View):
         user = request.user
         base_info = BaseInformation.objects.filter(user=user).first()
 
-        grades_received = Grade.objects.filter(
-            message__offer__owner=request.user
-        ).aggregate(
-            avg_grade=Coalesce(Avg('grade'), 0, output_field=FloatField())
-        )['avg_grade']
+        avg_grade = get_reputation(user).average
 
-        answers_received = Answer.objects.filter(
-            answer__message__offer__owner=request.user
-        ).aggregate(
-            avg_grade_answer=Coalesce(Avg('grade_answer'), 0, output_field=FloatField())
-        )['avg_grade_answer']
+        return render(request, 'your_profile.html', {'user': user, 'base_info': base_info, 'avg_grade': avg_grade})
 
-        avg_grade = (grades_received + answers_received) / 2 if (grades_received + answers_received) > 0 else 0
 
-        return render(request, 'your_profile.html', {'user': user, 'base_info': base_info, 'avg_grade': avg_grade})
+class RatingAnalyticsView(LoginRequiredMixin, View):
+
+    def get(self, request):
+        offer_id = request.GET.get('offer', '')
+        offer = get_object_or_404(Offer, pk=offer_id, owner=request.user) if offer_id.isdigit() else None
+        since, until = parse_day(request.GET.get('since')), parse_day(request.GET.get('until'))
+
+        analytics = rating_analytics(request.user.id, offer.id if offer else None, since, until)
+        offers = offer_rating_summaries(request.user.id, since, until) if offer is None else []
+
+        return render(request, 'rating_analytics.html', {
+            'analytics': analytics,
+            'offers': offers,
+            'offer': offer,
+            'since': since,
+            'until': until,
+        })
 
 
 class AddBaseInfoView(LoginRequiredMixin, View):
@@ -81,7 +113,9 @@ class EditBaseInfoView(LoginRequiredMixin, View):
         return render(request, 'edit_base_info.html', {'form': form})
 
 
-class AddOfferView(LoginRequiredMixin, View):
+class AddOfferView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'offer'
+
     def get(self, request):
         form = OfferForm()
         categories = Category.objects.all()
@@ -96,11 +130,9 @@ class AddOfferView(LoginRequiredMixin, View):
             offer.save()
 
             categories_ids_list = request.POST.getlist('category')
-            for category_id in categories_ids_list:
-                category = Category.objects.get(id=category_id)
-                offer.category.add(category)
-
-            offer.save()
+            offer.category.set(categories_ids_list)
+            if offer.latitude is None:
+                run_async(geocode_offers, [offer.id])
             return redirect('offers_list')
 
         return render(request, 'add_offer.html', {'form': form, 'categories': categories})
@@ -125,7 +157,12 @@ class EditOfferView(LoginRequiredMixin, View):
         offer_info = get_object_or_404(Offer, id=offer_id)
         form = OfferForm(request.POST, instance=offer_info)
         if form.is_valid():
-            form.save()
+            moved = {'country', 'city'} & set(form.changed_data)
+            if moved and not {'latitude', 'longitude'} & set(form.changed_data):
+                form.instance.latitude = form.instance.longitude = None
+            offer_info = form.save()
+            if offer_info.latitude is None:
+                run_async(geocode_offers, [offer_info.id])
             return redirect('offers_list')
 
         return render(request, 'edit_offer.html', {'form': form, 'offer_id': offer_id, 'offer': offer})
@@ -154,19 +191,50 @@ class DeleteOfferView(LoginRequiredMixin, View):
 class OffersListView(View):
 
     def get(self, request):
-        search_country = request.GET.get('search', '')
-        offers = Offer.objects.filter(is_active=True)
-        if search_country:
-            offers = offers.filter(country__icontains=search_country)
-
-        categories = Category.objects.all()
-        paginator = Paginator(offers, 2)
-        page = request.GET.get('page', 1)
-        print(page)
-        offers_list = paginator.get_page(page)
+        search = request.GET.get('search', '')
+        offers = Offer.objects.filter(is_active=True).select_related('owner').prefetch_related('category')
+        ordering = ('since_when', 'id')
+        similar_locations = False
+        if search:
+            found = search_offers(offers, search)
+            ordering = ('-search_rank', 'id')
+            if not found.exists():
+                found = fuzzy_location_offers(offers, search)
+                ordering = ('-location_similarity', 'id')
+                similar_locations = found.exists()
+            offers = found
+
+        availability = parse_availability(request.GET)
+        if availability:
+            offers = filter_available(offers, *availability)
+
+        filters = parse_facet_filters(request.GET)
+        query_key = f"{' '.join(search_terms(search))}|{similar_locations}|{availability}"
+        facets, offers_count = get_facets(offers, query_key, filters, request.GET)
+        offers = with_owner_rating(apply_facet_filters(offers, filters))
+        sort = request.GET.get('sort', '')
+        if sort == 'rating':
+            ordering = ('-owner_rating', 'id')
+
+        page_size = get_page_size(request, settings.OFFERS_LIST_PAGE_SIZE, settings.OFFERS_LIST_MAX_PAGE_SIZE)
+        page = request.GET.get('page', '')
+        if page.isdigit() and int(page) <= settings.OFFERS_LIST_MAX_OFFSET_PAGE:
+            paginator = Paginator(offers.order_by(*ordering), page_size)
+            offers_list = paginator.get_page(page)
+            page_range = range(1, min(paginator.num_pages, settings.OFFERS_LIST_MAX_OFFSET_PAGE) + 1)
+            next_cursor = None
+            if offers_list.number == settings.OFFERS_LIST_MAX_OFFSET_PAGE and offers_list.has_next():
+                # Pages past the last numbered one are only reachable by cursor.
+                next_cursor = KeysetPaginator(offers, ordering, page_size).cursor(offers_list[-1])
+        else:
+            paginator = KeysetPaginator(offers, ordering, page_size)
+            offers_list = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+            page_range = None
+            next_cursor = None
 
-        if search_country:
-            offers = offers.filter(country__icontains=search_country)
+        query = request.GET.copy()
+        for key in ('page', 'after', 'before'):
+            query.pop(key, None)
 
         user = request.user if request.user.is_authenticated else None
 
@@ -175,87 +243,247 @@ class OffersListView(View):
                 'offers': offers,
                 'user': user,
                 'offers_list': offers_list,
-                'categories': categories,
+                'search': search,
+                'similar_locations': similar_locations,
+                'keyset': isinstance(offers_list, KeysetPage),
+                'page_range': page_range,
+                'next_cursor': next_cursor,
+                'query': query.urlencode(),
+                'facets': facets,
+                'offers_count': offers_count,
+                'sort': sort,
             }
         else:
             ctx = {
                 'offers': offers,
                 'offers_list': offers_list,
-                'categories': categories,
+                'search': search,
+                'similar_locations': similar_locations,
+                'keyset': isinstance(offers_list, KeysetPage),
+                'page_range': page_range,
+                'next_cursor': next_cursor,
+                'query': query.urlencode(),
+                'facets': facets,
+                'offers_count': offers_count,
+                'sort': sort,
             }
 
         return render(request, 'offers_list.html', ctx)
 
 
+class LocationLookupView(View):
+
+    def get(self, request):
+        query = request.GET.get('q', '')
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        results = match_locations(Offer.objects.filter(is_active=True), query, limit) if query.strip() else []
+        return JsonResponse({'query': query, 'results': results})
+
+
+class LocationAutocompleteView(View):
+
+    def get(self, request):
+        query = request.GET.get('q', '')
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        return JsonResponse({'query': query, 'results': suggest_locations(query, limit)})
+
+
+class AvailabilityCalendarView(View):
+
+    def get(self, request):
+        today = timezone.now().date()
+        try:
+            year, month = map(int, request.GET.get('month', f'{today:%Y-%m}').split('-'))
+            days = availability_calendar(year, month)
+        except ValueError:
+            return JsonResponse({'error': 'month must be in YYYY-MM format.'}, status=400)
+        return JsonResponse({
+            'month': f'{year:04d}-{month:02d}',
+            'days': [{'date': day, 'offers': count} for day, count in days],
+        })
+
+
+class LeaderboardView(View):
+
+    def get(self, request):
+        leaderboard = get_leaderboard()
+        country = request.GET.get('country', '')
+        category_id = request.GET.get('category', '')
+        category_id = int(category_id) if category_id.isdigit() else None
+        ranking = leaderboard.ranking(country, category_id)
+
+        top = ranking.top(settings.LEADERBOARD_SIZE) if ranking else []
+        owners = User.objects.in_bulk([row['owner_id'] for row in top])
+        for position, row in enumerate(top, 1):
+            row.update(position=position, owner=owners.get(row['owner_id']))
+        your_rank = ranking.rank(request.user.id) if ranking and request.user.is_authenticated else None
+
+        return render(request, 'leaderboard.html', {
+            'top': top,
+            'your_rank': your_rank,
+            'ranked': len(ranking) if ranking else 0,
+            'countries': leaderboard.countries(),
+            'categories': Category.objects.filter(id__in=leaderboard.category_ids()).order_by('name'),
+            'country': country,
+            'category_id': category_id,
+        })
+
+
+class NearbyOffersView(View):
+
+    def get(self, request):
+        try:
+            latitude = float(request.GET['lat'])
+            longitude = float(request.GET['lon'])
+            radius = float(request.GET.get('radius', settings.NEARBY_OFFERS_DEFAULT_RADIUS))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'lat and lon are required numbers.'}, status=400)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and radius > 0):
+            return JsonResponse({'error': 'Coordinates or radius out of range.'}, status=400)
+        radius = min(radius, settings.NEARBY_OFFERS_MAX_RADIUS)
+
+        offers = nearby_offers(Offer.objects.filter(is_active=True), latitude, longitude, radius)
+        page_size = get_page_size(request, settings.OFFERS_LIST_PAGE_SIZE, settings.OFFERS_LIST_MAX_PAGE_SIZE)
+        paginator = KeysetPaginator(offers, ('distance', 'id'), page_size)
+        page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+        results = [{
+            'id': offer.id,
+            'name': offer.name,
+            'country': offer.country,
+            'city': offer.city,
+            'latitude': offer.latitude,
+            'longitude': offer.longitude,
+            'distance': round(offer.distance, 3),
+            'url': reverse('offer_details', args=[offer.id]),
+        } for offer in page]
+        return JsonResponse({
+            'radius': radius,
+            'results': results,
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+
 class YourOffers(LoginRequiredMixin, View):
     def get(self, request):
-        offers = Offer.objects.filter(owner=request.user).order_by('until_when')
+        offers = Offer.objects.filter(owner=request.user).prefetch_related('category').order_by('until_when')
         return render(request, 'your_offers.html', {'offers': offers})
 
 
 class OfferDetailsView(View):
 
     def get(self, request, offer_id):
-        offer = Offer.objects.get(id=offer_id)
-        categories = Category.objects.all()
-        return render(request, 'offer_details.html', {'offer': offer, 'categories': categories})
+        offers = with_owner_rating(Offer.objects.select_related('owner').prefetch_related('category'))
+        offer = get_object_or_404(offers, id=offer_id)
+        return render(request, 'offer_details.html', {'offer': offer})
 
 
 class MessageBoxView(LoginRequiredMixin, View):
 
     def get(self, request):
-        offers_involved = Offer.objects.filter(
-            Q(message__sender=request.user) |
-            Q(message__receiver=request.user)
-        )
-        conversations = {}
-        for offer in offers_involved:
-            conversations[offer] = Message.objects.filter(
-                Q(offer=offer) &
-                (Q(receiver=request.user) | Q(sender=request.user))
-            ).order_by('time')
+        threads = user_conversations(request.user).select_related(
+            'offer', 'owner', 'applicant', 'last_message'
+        ).order_by('-last_activity')
+        conversations = [{
+            'offer': conversation.offer,
+            'partner': conversation.partner(request.user),
+            'last_message': conversation.last_message,
+            'unread': conversation.unread(request.user),
+        } for conversation in threads]
 
         return render(request, 'messages_box.html', {'conversations': conversations})
 
 
+class MessageSearchView(LoginRequiredMixin, View):
+
+    def get(self, request):
+        search = request.GET.get('q', '')
+        page_size = get_page_size(request, settings.MESSAGE_SEARCH_PAGE_SIZE, settings.MESSAGE_SEARCH_MAX_PAGE_SIZE)
+        found = search_messages(request.user, search).select_related('offer', 'sender', 'receiver')
+        page = KeysetPaginator(found, ('-search_rank', '-id'), page_size).get_page(
+            after=request.GET.get('after'), before=request.GET.get('before')
+        )
+        results = [{
+            'message': message,
+            'partner': message.receiver if message.sender_id == request.user.id else message.sender,
+            'snippet': message_snippet(message, search),
+        } for message in page]
+
+        return render(request, 'messages_search.html', {
+            'results': results, 'page': page, 'search': search, 'query': urlencode({'q': search}),
+        })
+
+
 class MessagesView(LoginRequiredMixin, View):
     def get(self, request, offer_id):
         offer = get_object_or_404(Offer, pk=offer_id)
-        q1 = Q(offer_id=offer_id)
-        q2 = Q(sender=request.user)
-        q3 = Q(receiver=request.user)
-
-        messages = Message.objects.filter(q1, q2 | q3).distinct().order_by('-time').select_related('sender', 'receiver')
+        threads = user_conversations(request.user).filter(offer=offer).select_related(
+            'owner', 'applicant', 'last_message__sender', 'last_message__receiver'
+        ).order_by('-last_activity')
+        conversations = [{
+            'last_message': conversation.last_message,
+            'partner': conversation.partner(request.user),
+            'unread': conversation.unread(request.user),
+        } for conversation in threads]
 
-        conversations = {}
-        for message in messages:
-            partner = message.receiver if message.sender == request.user else message.sender
-            key = (request.user, partner) if request.user.id < partner.id else (partner, request.user)
+        return render(request, 'messages_view.html', {'conversations': conversations, 'offer': offer})
 
-            if key not in conversations:
-                conversations[key] = {
-                    'last_message': message,
-                    'partner': partner,
-                    'messages': []
-                }
 
-            conversations[key]['messages'].append(message)
+class BroadcastView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'message'
 
-        sorted_conversations = sorted(conversations.values(), key=lambda x: x['last_message'].time, reverse=True)
+    def get(self, request, offer_id):
+        offer = get_object_or_404(Offer, pk=offer_id, owner=request.user)
+        applicants = broadcast_conversations(offer).count()
+        return render(request, 'broadcast.html', {
+            'offer': offer,
+            'applicants': applicants,
+            'message_form': MessageForm,
+        })
 
-        return render(request, 'messages_view.html', {'conversations': sorted_conversations, 'offer': offer})
+    def post(self, request, offer_id):
+        offer = get_object_or_404(Offer, pk=offer_id, owner=request.user)
+        message_form = MessageForm(request.POST)
+        if message_form.is_valid():
+            broadcast_message(offer, message_form.cleaned_data['message'])
+            return redirect('messages_view', offer_id=offer.id)
+        applicants = broadcast_conversations(offer).count()
+        return render(request, 'broadcast.html', {
+            'offer': offer,
+            'applicants': applicants,
+            'message_form': message_form,
+        })
 
 
-class TopicView(LoginRequiredMixin, View):
+class TopicView(LoginRequiredMixin, RateLimitMixin, View):
+    rate_limit_scope = 'message'
 
     def get(self, request, offer_id, sender_id):
         offer = get_object_or_404(Offer, pk=offer_id)
-        messages = Message.objects.filter(offer_id=offer_id)
-        messages = messages.filter(sender_id=sender_id) | messages.filter(receiver_id=sender_id)
-        messages = messages.order_by('time')
+        conversation = find_conversation(offer, topic_applicant_id(offer, sender_id, request.user))
+        history = self.latest_messages(conversation)
         message_form = MessageForm
+        if conversation:
+            mark_read(conversation, request.user)
         return render(request, 'topic_view.html',
-                      {'messages': messages, 'message_form': message_form, 'offer': offer, 'sender_id': sender_id})
+                      {'messages': history.object_list[::-1], 'older': history.next_cursor,
+                       'latest': history.paginator.cursor(history[0]) if history else '',
+                       'partner_read_at': conversation.partner_read_at(request.user) if conversation else None,
+                       'message_form': message_form, 'offer': offer, 'sender_id': sender_id,
+                       'conversation': conversation})
+
+    def latest_messages(self, conversation):
+        messages = Message.objects.filter(conversation=conversation) if conversation else Message.objects.none()
+        history = KeysetPaginator(messages.select_related('sender', 'receiver'), ('-time', '-id'),
+                                  settings.TOPIC_PAGE_SIZE).page()
+        return continue_from_archive(history, [conversation.id]) if conversation else history
 
     def get_receiver(self, offer_id, sender_id):
         offer = Offer.objects.get(pk=offer_id)
@@ -265,9 +493,6 @@ class TopicView(LoginRequiredMixin, View):
             return offer.owner_id
 
     def post(self, request, offer_id, sender_id):
-        messages = Message.objects.filter(offer_id=offer_id)
-        messages = messages.filter(sender_id=sender_id) | messages.filter(receiver_id=sender_id)
-        messages = messages.order_by('time')
         message_form = MessageForm(request.POST)
 
         if message_form.is_valid():
@@ -275,10 +500,72 @@ class TopicView(LoginRequiredMixin, View):
             new_message.offer_id = offer_id
             new_message.sender = request.user
             new_message.receiver_id = self.get_receiver(offer_id, sender_id)
-            new_message.save()
+            with transaction.atomic():
+                new_message.save()
             return redirect('topic_view', offer_id=offer_id, sender_id=sender_id)
 
-        return render(request, 'topic_view.html', {'messages': messages, 'message_form': message_form})
+        offer = get_object_or_404(Offer, pk=offer_id)
+        conversation = find_conversation(offer, topic_applicant_id(offer, sender_id, request.user))
+        history = self.latest_messages(conversation)
+        return render(request, 'topic_view.html',
+                      {'messages': history.object_list[::-1], 'older': history.next_cursor,
+                       'latest': history.paginator.cursor(history[0]) if history else '',
+                       'partner_read_at': conversation.partner_read_at(request.user) if conversation else None,
+                       'message_form': message_form, 'offer': offer, 'sender_id': sender_id,
+                       'conversation': conversation})
+
+
+class TopicHistoryView(LoginRequiredMixin, View):
+
+    def get(self, request, offer_id, sender_id):
+        offer = get_object_or_404(Offer, pk=offer_id)
+        applicant_id = topic_applicant_id(offer, sender_id, request.user)
+        messages = topic_messages(offer, applicant_id).select_related('sender')
+        page_size = get_page_size(request, settings.TOPIC_PAGE_SIZE, settings.TOPIC_MAX_PAGE_SIZE)
+        after = request.GET.get('after')
+        history = KeysetPaginator(messages, ('-time', '-id'), page_size).get_page(after=after)
+        history = continue_from_archive(history, topic_conversation_ids(offer, applicant_id), after)
+
+        results = [message_payload(message) for message in reversed(history.object_list)]
+        return JsonResponse({'results': results, 'older': history.next_cursor})
+
+
+class TopicUpdatesView(View):
+
+    async def get(self, request, offer_id, sender_id):
+        user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+        if user is None:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        conversation = await sync_to_async(self.get_conversation)(offer_id, sender_id, user)
+        after = request.GET.get('after')
+        if conversation is None or not after:
+            latest = await sync_to_async(self.latest_cursor)(conversation)
+            return JsonResponse({'results': [], 'after': after or latest})
+
+        # Subscribe before looking for messages, so one saved in between still wakes this request up.
+        with get_broker().subscribe(conversation_channel(conversation.id)) as subscription:
+            try:
+                results, cursor = await sync_to_async(messages_after)(conversation.id, after, settings.TOPIC_PAGE_SIZE)
+            except (ValueError, ValidationError, TypeError):
+                # Broken cursors (InvalidCursor) as well as cursor values of the wrong type for their field.
+                return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+            if not results:
+                try:
+                    await subscription.get(timeout=settings.LONG_POLL_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return JsonResponse({'results': [], 'after': after})
+                results, cursor = await sync_to_async(messages_after)(conversation.id, after, settings.TOPIC_PAGE_SIZE)
+        return JsonResponse({'results': results, 'after': cursor})
+
+    def get_conversation(self, offer_id, sender_id, user):
+        offer = get_object_or_404(Offer, pk=offer_id)
+        return find_conversation(offer, topic_applicant_id(offer, sender_id, user))
+
+    def latest_cursor(self, conversation):
+        if conversation is None:
+            return None
+        latest = Message.objects.filter(conversation=conversation).order_by('-time', '-id').values('time', 'id').first()
+        return encode_cursor([latest['time'], latest['id']]) if latest else None
 
 
 class GradeView(LoginRequiredMixin, View):
@@ -297,7 +584,7 @@ class GradeView(LoginRequiredMixin, View):
             except Grade.DoesNotExist:
                 grade = None
 
-            answer = Answer.objects.filter(answer=grade).first()
+            answer = Answer.objects.filter(answer=grade).first() if grade else None
             form = GradeForm(instance=grade)
 
             ctx = {
@@ -348,23 +635,30 @@ class GradeView(LoginRequiredMixin, View):
 
 class YourGradesView(LoginRequiredMixin, View):
     def get(self, request):
-        grades = Grade.objects.filter(message__sender=request.user) \
-            .select_related('message') \
-            .prefetch_related(Prefetch('message__offer', queryset=Offer.objects.all())) \
-            .order_by('-message__offer__name')
-
+        grades = self.get_page(request)
         ctx = {
-            'grades_list': [{
-                'id': grade.id,
-                'offer_names': grade.message.offer.name,
-                'owner_names': grade.message.offer.owner.username,
-                'grade_value': grade.grade,
-            }
-                for grade in grades
-            ]}
+            'grades_list': [rating_history_entry(grade) for grade in grades],
+            'grades_page': grades,
+        }
 
         return render(request, 'your_grades.html', ctx)
 
+    @staticmethod
+    def get_page(request):
+        page_size = get_page_size(request, settings.RATING_HISTORY_PAGE_SIZE, settings.RATING_HISTORY_MAX_PAGE_SIZE)
+        paginator = KeysetPaginator(rating_history(request.user), ('-id',), page_size)
+        return paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+
+class YourGradesHistoryView(LoginRequiredMixin, View):
+    def get(self, request):
+        grades = YourGradesView.get_page(request)
+        return JsonResponse({
+            'results': [rating_history_entry(grade) for grade in grades],
+            'next': grades.next_cursor,
+            'previous': grades.previous_cursor,
+        })
+
 
 class AnswerToRatingView(LoginRequiredMixin, View):
     def get(self, request, grade_id):
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db.models import Q
+from django.http.request import validate_host
+
+from work_and_travel_app.models import Conversation
+from work_and_travel_app.pubsub import conversation_channel, get_broker, user_channel
+
+CONVERSATION_PATH = re.compile(r'^/ws/conversations/(?P<conversation_id>\d+)/$')
+
+# Close codes in the 4000-4999 range are free for applications.
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+
+
+def _allowed_origin(origin):
+    # Browsers send cookies with cross-site WebSocket handshakes, so foreign pages must be rejected.
+    if origin is None:
+        return True
+    host = urlsplit(origin).hostname or ''
+    allowed_hosts = settings.ALLOWED_HOSTS or (['.localhost', '127.0.0.1', '[::1]'] if settings.DEBUG else [])
+    return validate_host(host, allowed_hosts)
+
+
+@sync_to_async
+def _authorize(scope, conversation_id):
+    cookies = SimpleCookie()
+    origin = None
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+        elif name == b'origin':
+            origin = value.decode('latin-1')
+    if not _allowed_origin(origin):
+        return None
+    session_key = cookies[settings.SESSION_COOKIE_NAME].value if settings.SESSION_COOKIE_NAME in cookies else None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=session))
+    if not user.is_authenticated:
+        return None
+    allowed = Conversation.objects.filter(Q(owner=user) | Q(applicant=user), pk=conversation_id).exists()
+    return user.id if allowed else None
+
+
+async def conversation_socket(scope, receive, send):
+    """
+    WebSocket at /ws/conversations/<id>/ for the two participants of a conversation. Every frame sent
+    to the client is a JSON event: {"type": "message", ...} for new messages of the conversation and
+    {"type": "unread", "conversation": id, "unread": n} for the user's unread counters.
+    """
+    match = CONVERSATION_PATH.match(scope['path'])
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if not match:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    conversation_id = int(match['conversation_id'])
+    user_id = await _authorize(scope, conversation_id)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+
+    await send({'type': 'websocket.accept'})
+    with get_broker().subscribe(conversation_channel(conversation_id), user_channel(user_id)) as subscription:
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                published = asyncio.ensure_future(subscription.get())
+                done, pending = await asyncio.wait({published, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnect in done:
+                    published.cancel()
+                    break
+                await send({'type': 'websocket.send', 'text': json.dumps(published.result())})
+        finally:
+            disconnect.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    # Clients only listen, anything they send is ignored.
+    while (await receive())['type'] != 'websocket.disconnect':
+        pass